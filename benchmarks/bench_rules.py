@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qa_spc import detect_violations
+
+# ===================================================================
+# BENCHMARK: Nelson rule engine scaling (1e3 .. 1e7 points)
+# ===================================================================
+# Usage: python benchmarks/bench_rules.py [--max 1e7] [--repeat 3]
+# Reports ns/point per size; a roughly flat column means linear scaling.
+
+def make_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0, 1, n)
+    x[n//3:n//3 + n//50] += 1.5                      # injected shift
+    x[n//2:n//2 + 20] = np.linspace(-2, 2, min(20, n - n//2))   # injected trend
+    return x
+
+def bench(n, repeat):
+    x = make_series(n)
+    ucl = np.full(n, 3.0) + np.random.default_rng(1).uniform(0, 0.2, n)   # per-point limits (p/u style)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        viol = detect_violations(x, ucl, -ucl, 0.0)
+        best = min(best, time.perf_counter() - t0)
+    return best, sum(len(v) for v in viol.values())
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max", type=float, default=1e7)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    sizes = [int(10**e) for e in range(3, 8) if 10**e <= args.max]
+    print(f"{'points':>10} {'seconds':>10} {'ns/point':>10} {'flagged':>10}")
+    per_point = []
+    for n in sizes:
+        t, flagged = bench(n, args.repeat)
+        per_point.append(t / n * 1e9)
+        print(f"{n:>10,} {t:>10.4f} {per_point[-1]:>10.1f} {flagged:>10,}")
+    if len(per_point) >= 3:
+        ratio = per_point[-1] / min(per_point[1:])
+        print(f"ns/point ratio largest vs best (excluding 1e3 overhead): {ratio:.2f}x")
+
+if __name__ == "__main__":
+    main()
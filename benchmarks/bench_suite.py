@@ -0,0 +1,182 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synth import make_production_data, to_csv_bytes
+from qa_capability import capability_table
+from qa_charts import build_two_panel_chart, build_varying_limit_chart
+from qa_corr import CorrStats
+from qa_detect import auto_detect_all_columns
+from qa_filter import FilterIndex
+from qa_ingest import compact_frame, parse_file
+from qa_rollup import RollupCube, build_hierarchy
+from qa_spc import (compute_c_chart, compute_imr_chart, compute_np_chart, compute_p_chart, compute_u_chart,
+                    compute_xbar_r_chart, compute_xbar_s_chart, detect_violations, screen_strata)
+from qa_table import export_file
+
+# ===================================================================
+# BENCHMARK SUITE: hot paths vs dataset size, with a JSON baseline
+# ===================================================================
+# Usage:
+#   python benchmarks/bench_suite.py                       # 1e3..1e6 rows, print only
+#   python benchmarks/bench_suite.py --max 1e7 --save      # write benchmarks/baseline.json
+#   python benchmarks/bench_suite.py --compare             # diff against the baseline, exit 1 on regression
+#   python benchmarks/bench_suite.py --only p_chart,detect_violations
+# Time is the best of --repeat runs; peak memory is a separate tracemalloc run
+# (Python + NumPy/pandas allocations), so tracing overhead does not skew time.
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DATE, N, NG, DEFECT, MEAS = "Tanggal", "qty check", "qty ng", "Jenis_Defect", "diameter"
+STRATA = ["Line", "Shift"]
+
+def weekly_trend(df):
+    d = df.dropna(subset=[DATE])
+    week = d[DATE].dt.to_period("W-MON").dt.start_time
+    return d.groupby(week)[[N, NG]].sum(), d.groupby(week)[MEAS].mean()
+
+def pareto(df):
+    p = df.groupby(DEFECT)[NG].sum().sort_values(ascending=False)
+    return p.cumsum() / p.sum() * 100
+
+def heatmap(df):
+    return df.groupby(STRATA)[NG].sum().unstack(fill_value=0)
+
+def warm(fn):
+    # run once in setup, so the timed calls measure the cache-hit path from the first repeat
+    fn(); return fn
+
+def download(df, fmt):
+    # export through the same conversion st.download_button applies to its deferred callable; raises if the type is unsupported
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+    return convert_data_to_bytes_and_infer_mime(export_file(df, fmt), TypeError(f"export_file({fmt!r}) returned an unsupported type"))[0]
+
+# name -> fn(ctx) returning the zero-arg callable to time; ctx holds per-size inputs
+CASES = {
+    "ingest_csv":        lambda c: lambda: parse_file(c["csv"], {"kind": "csv", "sep": ","}),
+    "compact":           lambda c: lambda: compact_frame(c["parsed"]),
+    "auto_detect":       lambda c: lambda: auto_detect_all_columns(c["df"]),
+    "filter_index":      lambda c: lambda: FilterIndex(c["df"], STRATA + [DEFECT], DATE),
+    "p_chart":           lambda c: lambda: compute_p_chart(c["df"], DATE, N, NG),
+    "np_chart":          lambda c: lambda: compute_np_chart(c["df"], DATE, N, NG),
+    "c_chart":           lambda c: lambda: compute_c_chart(c["df"], DATE, NG),
+    "u_chart":           lambda c: lambda: compute_u_chart(c["df"], DATE, N, NG),
+    "imr_chart":         lambda c: lambda: compute_imr_chart(c["df"], MEAS, DATE),
+    "xbar_r_chart":      lambda c: lambda: compute_xbar_r_chart(c["df"], MEAS, None, 5),
+    "xbar_s_chart":      lambda c: lambda: compute_xbar_s_chart(c["df"], MEAS, None, 10),
+    "xbar_r_by_day":     lambda c: lambda: compute_xbar_r_chart(c["df"], MEAS, DATE),   # variable subgroup sizes
+    "screen_strata":     lambda c: lambda: screen_strata(c["df"], DATE, N, NG, STRATA, "p"),
+    "detect_violations": lambda c: (lambda x: lambda: detect_violations(x, x.mean() + 3*x.std(), x.mean() - 3*x.std(), x.mean()))(c["df"][MEAS].to_numpy(dtype=float)),
+    "figure_p":          lambda c: (lambda r: lambda: build_varying_limit_chart.__wrapped__(r, "p", "p", "p̄", rule_traces=True))(compute_p_chart(c["df"], DATE, N, NG)),
+    "figure_imr":        lambda c: (lambda r: lambda: build_two_panel_chart.__wrapped__(r, ["I", "MR"], "I-MR"))(compute_imr_chart(c["df"], MEAS, DATE)),
+    "figure_imr_cached": lambda c: warm(lambda r=compute_imr_chart(c["df"], MEAS, DATE): build_two_panel_chart(r, ["I", "MR"], "I-MR")),   # always a hit
+    "pareto":            lambda c: lambda: pareto(c["df"]),
+    "heatmap":           lambda c: lambda: heatmap(c["df"]),
+    "weekly_trend":      lambda c: lambda: weekly_trend(c["df"]),
+    "rollup_cube":       lambda c: lambda: RollupCube(c["df"], DATE, [N, NG], [MEAS], STRATA + [DEFECT]),
+    "capability":        lambda c: lambda: capability_table(c["df"], {MEAS: (9.7, 10.3)}, STRATA, DATE),
+    "hierarchy":         lambda c: (lambda t: lambda: build_hierarchy(t, STRATA + [DEFECT], NG))(RollupCube(c["df"], DATE, [NG], (), STRATA + [DEFECT]).table(None, STRATA + [DEFECT])),
+    "corr_stats":        lambda c: lambda: CorrStats(c["df"], [N, NG, MEAS]).corr(),
+    "export_csv":        lambda c: lambda: download(c["df"], "CSV"),
+    "export_parquet":    lambda c: lambda: download(c["df"], "Parquet"),
+}
+
+def make_context(n, seed):
+    raw = make_production_data(n, seed)
+    csv = to_csv_bytes(raw)
+    parsed = parse_file(csv, {"kind": "csv", "sep": ","})
+    return {"csv": csv, "parsed": parsed, "df": compact_frame(parsed)}
+
+def measure(fn, repeat, memory):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        gc.collect(); tracemalloc.start()
+        try: fn(); peak = tracemalloc.get_traced_memory()[1]
+        finally: tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_mb": None if peak is None else round(peak / 1024**2, 3)}
+
+def git_commit():
+    try: return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError): return None
+
+def run(sizes, cases, repeat, memory, seed):
+    results = {}
+    print(f"{'case':<18} {'rows':>10} {'seconds':>10} {'ns/row':>9} {'peak MB':>9}")
+    for n in sizes:
+        ctx = make_context(n, seed)
+        for name in cases:
+            r = measure(CASES[name](ctx), repeat if n < 10**7 else 1, memory)
+            results[f"{name}@{n}"] = r
+            peak = "" if r["peak_mb"] is None else f"{r['peak_mb']:.1f}"
+            print(f"{name:<18} {n:>10,} {r['seconds']:>10.4f} {r['seconds']/n*1e9:>9.1f} {peak:>9}")
+        del ctx
+    return results
+
+def compare(results, baseline, tolerance):
+    # ratios on runs under ~20 ms are mostly noise; only flag cases above both thresholds
+    regressions = []
+    print(f"\n{'case@rows':<30} {'base s':>9} {'now s':>9} {'ratio':>7} {'base MB':>9} {'now MB':>9}")
+    for key, r in results.items():
+        b = baseline.get("results", {}).get(key)
+        if not b: continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("nan")
+        mem_ratio = r["peak_mb"] / b["peak_mb"] if r.get("peak_mb") and b.get("peak_mb") else None
+        flag = ""
+        if ratio > tolerance and r["seconds"] > 0.02: flag = " ◀ time"; regressions.append(key)
+        if mem_ratio and mem_ratio > tolerance and r["peak_mb"] > 1: flag += " ◀ mem"; regressions.append(key)
+        fmt = lambda v: "" if v is None else f"{v:.1f}"
+        print(f"{key:<30} {b['seconds']:>9.4f} {r['seconds']:>9.4f} {ratio:>6.2f}x {fmt(b.get('peak_mb')):>9} {fmt(r.get('peak_mb')):>9}{flag}")
+    return sorted(set(regressions))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--min", type=float, default=1e3)
+    ap.add_argument("--max", type=float, default=1e6)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", default="", help="comma-separated case names")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="write results to --baseline")
+    ap.add_argument("--compare", action="store_true", help="compare with --baseline")
+    ap.add_argument("--tolerance", type=float, default=1.25)
+    args = ap.parse_args()
+
+    cases = [c.strip() for c in args.only.split(",") if c.strip()] or list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown: ap.error(f"unknown case(s): {', '.join(unknown)}; available: {', '.join(CASES)}")
+    sizes = [int(10**e) for e in range(3, 8) if args.min <= 10**e <= args.max]
+
+    results = run(sizes, cases, args.repeat, not args.no_memory, args.seed)
+    meta = {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(), "seed": args.seed, "repeat": args.repeat}
+
+    status = 0
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        print(f"\nbaseline: commit {baseline.get('meta', {}).get('commit')} • now: {meta['commit']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.2f}x: {', '.join(regressions)}"); status = 1
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump({"meta": meta, "results": results}, f, indent=1)
+        print(f"\nbaseline written to {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
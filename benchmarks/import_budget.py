@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ===================================================================
+# COLD-START BUDGET: import time and first paint of the landing page
+# ===================================================================
+# Usage:
+#   python benchmarks/import_budget.py                    # check against benchmarks/import_budget.json
+#   python benchmarks/import_budget.py --save             # write max(ms x --headroom, ms + --floor) as the new budget
+# Every probe runs in a fresh interpreter (best of --repeat), so nothing is
+# already in sys.modules. The landing probe is the first full AppTest run of
+# app_qa.py with no upload, including the streamlit import a new worker pays;
+# it also fails if any DEFERRED module was imported on the way.
+# Exit status 1 when a probe is over budget or a deferred import leaked.
+
+BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+APP = os.path.join(ROOT, "app_qa.py")
+CORE = ["qa_capability", "qa_corr", "qa_detect", "qa_filter", "qa_ingest", "qa_rollup", "qa_spc", "qa_store", "qa_stream", "qa_table", "qa_trace"]
+DEFERRED = ["scipy", "statsmodels", "plotly.express", "plotly.subplots", "qa_charts"]
+
+# name -> (modules imported before the clock starts, modules timed); None = landing page run
+PROBES = {
+    "import.core":   (["streamlit", "pandas", "numpy"], CORE),
+    "import.charts": (["streamlit", "pandas", "numpy"] + CORE, ["qa_charts"]),
+    "landing":       None,
+}
+
+_IMPORT = """
+import importlib, json, sys, time
+for m in {pre!r}: importlib.import_module(m)
+t0 = time.perf_counter()
+for m in {mods!r}: importlib.import_module(m)
+print(json.dumps({{"ms": (time.perf_counter() - t0) * 1000, "loaded": []}}))
+"""
+
+_LANDING = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "loaded": [m for m in {deferred!r} if m in sys.modules], "errors": [e.value for e in at.exception]}}))
+"""
+
+def run_probe(name):
+    spec = PROBES[name]
+    code = _LANDING.format(app=APP, deferred=DEFERRED) if spec is None else _IMPORT.format(pre=spec[0], mods=spec[1])
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    if out.returncode != 0: raise RuntimeError(f"{name}: {out.stderr.strip().splitlines()[-1] if out.stderr.strip() else out.returncode}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure(names, repeat):
+    results = {}
+    for name in names:
+        runs = [run_probe(name) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["ms"])
+        results[name] = {"ms": round(best["ms"], 1), "loaded": sorted({m for r in runs for m in r["loaded"]}), "errors": best.get("errors", [])}
+    return results
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--only", default="", help="comma-separated probe names")
+    ap.add_argument("--budget", default=BUDGET)
+    ap.add_argument("--save", action="store_true", help="write max(ms x --headroom, ms + --floor) to --budget")
+    ap.add_argument("--headroom", type=float, default=1.5)
+    ap.add_argument("--floor", type=float, default=25, help="minimum absolute headroom in ms: small probes sit within scheduler noise")
+    args = ap.parse_args()
+
+    names = [c.strip() for c in args.only.split(",") if c.strip()] or list(PROBES)
+    unknown = [c for c in names if c not in PROBES]
+    if unknown: ap.error(f"unknown probe(s): {', '.join(unknown)}; available: {', '.join(PROBES)}")
+
+    results = measure(names, args.repeat)
+    budget = {}
+    if not args.save and os.path.exists(args.budget):
+        with open(args.budget, encoding="utf-8") as f: budget = json.load(f).get("budget_ms", {})
+
+    status = 0
+    print(f"{'probe':<16} {'ms':>9} {'budget':>9}")
+    for name, r in results.items():
+        limit = budget.get(name)
+        flag = ""
+        if limit is not None and r["ms"] > limit: flag = " ◀ over budget"; status = 1
+        if r["loaded"]: flag += f" ◀ deferred import(s): {', '.join(r['loaded'])}"; status = 1
+        if r["errors"]: flag += f" ◀ app error: {r['errors'][0]}"; status = 1
+        print(f"{name:<16} {r['ms']:>9.1f} {'' if limit is None else f'{limit:.0f}':>9}{flag}")
+
+    if args.save:
+        meta = {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(), "headroom": args.headroom, "floor_ms": args.floor}
+        with open(args.budget, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "budget_ms": {n: round(max(r["ms"] * args.headroom, r["ms"] + args.floor)) for n, r in results.items()}}, f, indent=1)
+        print(f"\nbudget written to {args.budget}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
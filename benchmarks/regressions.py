@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from qa_cache import DatasetRegistry, ParseCache
+from qa_ingest import load_uploads
+from qa_rollup import build_hierarchy
+from qa_store import HistoryStore
+from qa_stream import resolve_server_path
+
+# ===================================================================
+# REGRESSION CHECKS (fixed bugs that must stay fixed)
+# ===================================================================
+# Usage:
+#   python benchmarks/regressions.py                      # every check
+#   python benchmarks/regressions.py --only history_resave
+# Each check builds its own small inputs in a temp directory (own parse cache,
+# registry and history store, nothing under ~/.cache or ~/.local is touched)
+# and raises AssertionError with the observed values on failure.
+# Exit status 1 when any check fails.
+
+class Upload:
+    # the slice of Streamlit's UploadedFile that load_uploads uses
+    def __init__(self, name, df):
+        self.name, self._data = name, df.to_csv(index=False).encode()
+
+    def getvalue(self):
+        return self._data
+
+def _load(tmp, *files):
+    return load_uploads(files, cache=ParseCache(os.path.join(tmp, "parsed")), registry=DatasetRegistry())
+
+MAPPING = {"date": "Tanggal", "sample_size": "qty check", "defect_count": "qty ng", "measurement": ["diameter"], "strat_cols": ["Line"]}
+
+def _files():
+    a = pd.DataFrame({"Tanggal": ["2024-01-01", "2024-01-02"], "Line": ["L1", "L1"], "qty check": [100, 100], "qty ng": [2, 3], "diameter": [10.0, 10.1]})
+    # B repeats A's first row once and has a row twice within itself
+    b = pd.DataFrame({"Tanggal": ["2024-01-01", "2024-01-03", "2024-01-03"], "Line": ["L1", "L1", "L1"], "qty check": [100, 50, 50], "qty ng": [2, 1, 1], "diameter": [10.0, 9.9, 9.9]})
+    return a, b
+
+def check_history_resave(tmp):
+    # A+B saved, then B alone: every row of B is a duplicate, whichever files came with it the first time
+    a, b = _files()
+    store = HistoryStore(os.path.join(tmp, "resave.sqlite"))
+    first = store.append(_load(tmp, Upload("A.csv", a), Upload("B.csv", b)), MAPPING)
+    again = store.append(_load(tmp, Upload("B.csv", b)), MAPPING)
+    total = store.limits()["total_n"]
+    assert first == {"new_rows": 5, "duplicates": 0}, first
+    assert again == {"new_rows": 0, "duplicates": 3}, again
+    assert total == a["qty check"].sum() + b["qty check"].sum(), total
+
+def check_history_dtype(tmp):
+    # A alone, then A+B where B has a blank qty ng (the column turns float in the combined upload)
+    a, b = _files()
+    b.loc[1, "qty ng"] = np.nan
+    store = HistoryStore(os.path.join(tmp, "dtype.sqlite"))
+    store.append(_load(tmp, Upload("A.csv", a)), MAPPING)
+    again = store.append(_load(tmp, Upload("A.csv", a), Upload("B.csv", b)), MAPPING)
+    assert again == {"new_rows": 3, "duplicates": 2}, again
+    assert store.limits()["total_n"] == a["qty check"].sum() + b["qty check"].sum(), store.limits()["total_n"]
+
+def check_history_backfill(tmp):
+    # an append of older dates starts a fresh MR chain instead of chaining onto the newest stored reading
+    m = {"date": "d", "measurement": ["x"], "strat_cols": []}
+    frame = lambda days, xs, src: pd.DataFrame({"d": pd.to_datetime(days), "x": xs, "_source_file": src})
+    store = HistoryStore(os.path.join(tmp, "backfill.sqlite"))
+    store.append(frame(["2024-02-01", "2024-02-02"], [10.0, 11.0], "new.csv"), m)       # MR 1
+    store.append(frame(["2024-01-01", "2024-01-02"], [50.0, 52.0], "old.csv"), m)       # MR 2, not |50 - 11|
+    store.append(frame(["2024-02-03"], [14.0], "next.csv"), m)                          # MR 3, onto 11
+    mr_bar = store.limits()["measurement"]["x"]["mr_bar"]
+    assert mr_bar == 2.0, mr_bar
+
+def check_hierarchy_ids(tmp):
+    # labels containing "/" must not give two nodes the same sunburst id
+    t = pd.DataFrame({"A": ["x/y", "x"], "B": ["z", "y/z"], "v": [3, 4]})
+    h = build_hierarchy(t, ["A", "B"], "v")
+    assert h["id"].is_unique and set(h["parent"]) <= set(h["id"]) | {""}, h.to_dict("records")
+
+def check_ingest_interrupt(tmp):
+    # a progress callback that raises (a Streamlit rerun mid-upload) keeps the files parsed before it
+    class Rerun(BaseException): pass
+    def progress(done, total, name):
+        if done == 2: raise Rerun()
+    a, b = _files()
+    files = [Upload("A.csv", a), Upload("B.csv", b), Upload("C.csv", a.iloc[:1])]
+    cache = ParseCache(os.path.join(tmp, "parsed"))
+    try: load_uploads(files, cache=cache, registry=DatasetRegistry(), progress=progress)
+    except Rerun: pass
+    load_uploads(files, cache=cache, registry=DatasetRegistry())
+    assert cache.stats["disk_hit"] == 2, cache.stats
+
+def check_server_paths(tmp):
+    # streaming server paths stay inside QA_STREAM_DIR: no "..", absolute paths or symlinks out of it
+    root = os.path.join(tmp, "data"); os.makedirs(root)
+    with open(os.path.join(root, "ok.csv"), "w") as f: f.write("a,b\n1,2\n")
+    with open(os.path.join(tmp, "secret.csv"), "w") as f: f.write("x\n")
+    os.symlink(os.path.join(tmp, "secret.csv"), os.path.join(root, "link.csv"))
+    assert resolve_server_path("ok.csv", root) == os.path.realpath(os.path.join(root, "ok.csv"))
+    for bad, r in [("../secret.csv", root), (os.path.join(tmp, "secret.csv"), root), ("link.csv", root), ("ok.csv", None)]:
+        try: resolve_server_path(bad, r)
+        except ValueError: continue
+        raise AssertionError(f"{bad!r} accepted under root {r!r}")
+
+CHECKS = {
+    "history_resave":   check_history_resave,
+    "history_dtype":    check_history_dtype,
+    "history_backfill": check_history_backfill,
+    "hierarchy_ids":    check_hierarchy_ids,
+    "server_paths":     check_server_paths,
+    "ingest_interrupt": check_ingest_interrupt,
+}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", default="", help="comma-separated check names")
+    args = ap.parse_args()
+
+    names = [c.strip() for c in args.only.split(",") if c.strip()] or list(CHECKS)
+    unknown = [c for c in names if c not in CHECKS]
+    if unknown: ap.error(f"unknown check(s): {', '.join(unknown)}; available: {', '.join(CHECKS)}")
+
+    status = 0
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmp:
+            try: CHECKS[name](tmp); print(f"{name:<20} ok")
+            except AssertionError as e: print(f"{name:<20} FAIL {e}"); status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
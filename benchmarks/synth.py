@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# SYNTHETIC PRODUCTION DATA (seeded)
+# ===================================================================
+# Shaped like the MES exports the app is used with: one row per inspection
+# record with date, line, shift, defect type, qty check and qty NG, plus
+# measurement columns. Defect rate has a step shift in the second half on one
+# line; measurements get a mean shift and a slow trend so the rule engine has
+# real signals to find. Column names match the Indonesian exports, so
+# auto-detection maps them the same way as real files.
+
+LINES   = ["L1", "L2", "L3", "L4"]
+SHIFTS  = ["A", "B", "C"]
+DEFECTS = ["Scratch", "Dent", "Crack", "Burr", "Warp", "Stain", "Bubble", "Chip"]
+DEFECT_WEIGHTS = np.array([30, 22, 15, 11, 8, 6, 5, 3], dtype=float)
+MEAS_COLS = ["diameter", "berat", "tebal", "panjang", "suhu"]
+MEAS_MEAN = {"diameter": 25.0, "berat": 120.0, "tebal": 2.5, "panjang": 80.0, "suhu": 210.0}
+
+def n_days(n):
+    # ~20 records per day, between 30 days and 10 years of history
+    return int(np.clip(n // 20, 30, 3650))
+
+def make_attribute_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    day = np.sort(rng.integers(0, n_days(n), n))
+    line = rng.integers(0, len(LINES), n)
+    qty = rng.integers(80, 240, n)
+    p = np.full(n, 0.03) + 0.004 * line
+    p[(day > day[-1] // 2) & (line == 1)] += 0.02                       # step shift on L2
+    return pd.DataFrame({
+        "Tanggal": pd.Timestamp("2020-01-01") + pd.to_timedelta(day, unit="D"),
+        "Line": np.asarray(LINES, dtype=object)[line],
+        "Shift": np.asarray(SHIFTS, dtype=object)[rng.integers(0, len(SHIFTS), n)],
+        "Jenis_Defect": np.asarray(DEFECTS, dtype=object)[rng.choice(len(DEFECTS), n, p=DEFECT_WEIGHTS / DEFECT_WEIGHTS.sum())],
+        "qty check": qty,
+        "qty ng": rng.binomial(qty, p),
+    })
+
+def make_variable_data(n, seed=0, n_meas=3):
+    rng = np.random.default_rng(seed + 1)
+    df = make_attribute_data(n, seed)[["Tanggal", "Line", "Shift"]]
+    t = np.arange(n) / max(n - 1, 1)
+    for i, c in enumerate(MEAS_COLS[:n_meas]):
+        mu, sd = MEAS_MEAN[c], MEAS_MEAN[c] * 0.004
+        x = rng.normal(mu, sd, n)
+        x[int(n * 0.6):int(n * 0.65)] += 1.5 * sd                       # injected shift
+        if i % 2: x += 2.0 * sd * t                                     # slow drift
+        df[c] = np.round(x, 3)
+    return df
+
+def make_production_data(n, seed=0, n_meas=2):
+    df = make_attribute_data(n, seed)
+    var = make_variable_data(n, seed, n_meas)
+    for c in MEAS_COLS[:n_meas]: df[c] = var[c].to_numpy()
+    return df
+
+def to_csv_bytes(df):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, date_format="%d/%m/%Y")               # non-ISO dates like the real exports
+    return buf.getvalue().encode()
@@ -0,0 +1,282 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+# ===================================================================
+# CONTENT-HASH PARSE CACHE
+# ===================================================================
+# Parsed upload frames are keyed on the file bytes plus reader options, so a
+# Streamlit rerun (or the same file uploaded again, in any session of this
+# process) skips read_excel/read_csv and type coercion entirely. Frames live in
+# a byte-bounded in-memory LRU and are spilled to Parquet on disk, itself
+# bounded by total size with least-recently-used eviction.
+
+CACHE_DIR       = os.environ.get("QA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "qa_system", "parsed"))
+CACHE_MEM_BYTES = int(float(os.environ.get("QA_CACHE_MEM_MB", "512")) * 1024**2)
+CACHE_DISK_BYTES = int(float(os.environ.get("QA_CACHE_DISK_MB", "4096")) * 1024**2)
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+def content_key(data, **options):
+    h = hashlib.blake2b(digest_size=20)
+    h.update(memoryview(data))
+    h.update(repr(sorted(options.items())).encode())
+    return h.hexdigest()
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class ParseCache:
+    def __init__(self, cache_dir=CACHE_DIR, mem_bytes=CACHE_MEM_BYTES, disk_bytes=CACHE_DISK_BYTES):
+        self.cache_dir  = cache_dir
+        self.mem_bytes  = mem_bytes
+        self.disk_bytes = disk_bytes if HAS_PARQUET else 0
+        self._mem  = OrderedDict()          # key -> (df, nbytes)
+        self._used = 0
+        self._lock = threading.RLock()
+        self.stats = {"mem_hit": 0, "disk_hit": 0, "miss": 0}
+        if self.disk_bytes:
+            try: os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError: self.disk_bytes = 0
+
+    # -- memory tier --
+    def _mem_get(self, key):
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None: return None
+            self._mem.move_to_end(key)
+            return hit[0]
+
+    def _mem_put(self, key, df):
+        nbytes = frame_nbytes(df)
+        if nbytes > self.mem_bytes: return
+        with self._lock:
+            if key in self._mem: self._used -= self._mem.pop(key)[1]
+            self._mem[key] = (df, nbytes); self._used += nbytes
+            while self._used > self.mem_bytes and self._mem:
+                _, (_, nb) = self._mem.popitem(last=False); self._used -= nb
+
+    # -- disk tier --
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _disk_get(self, key):
+        if not self.disk_bytes: return None
+        path = self._path(key)
+        if not os.path.exists(path): return None
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)                  # mtime doubles as LRU clock
+            return df
+        except Exception:
+            try: os.remove(path)
+            except OSError: pass
+            return None
+
+    def _disk_put(self, key, df):
+        if not self.disk_bytes: return
+        path = self._path(key); tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception:
+            # mixed-type object columns or non-string headers are not Parquet-safe; keep them memory-only
+            try: os.remove(tmp)
+            except OSError: pass
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.name.endswith(".parquet"):
+                    st_ = e.stat(); entries.append((st_.st_mtime, st_.st_size, e.path))
+        total = sum(s for _, s, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes: break
+            try: os.remove(path); total -= size
+            except OSError: pass
+
+    # -- public --
+    def get(self, key, memory=True):
+        df = self._mem_get(key)
+        if df is not None:
+            self.stats["mem_hit"] += 1; return df
+        df = self._disk_get(key)
+        if df is not None:
+            self.stats["disk_hit"] += 1
+            if memory: self._mem_put(key, df)
+            return df
+        return None
+
+    def put(self, key, df, memory=True):
+        # memory=False: disk tier only, for frames whose in-memory copy lives in the dataset registry
+        if memory: self._mem_put(key, df)
+        self._disk_put(key, df)
+
+    def get_or_parse(self, data, parse_fn, key=None, **options):
+        key = key or content_key(data, **options)
+        df = self.get(key)
+        if df is None:
+            self.stats["miss"] += 1
+            df = parse_fn()
+            self.put(key, df)
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear(); self._used = 0
+        if self.disk_bytes:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".parquet"):
+                    try: os.remove(os.path.join(self.cache_dir, name))
+                    except OSError: pass
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache():
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None: _parse_cache = ParseCache()
+        return _parse_cache
+
+# ===================================================================
+# SHARED DATASET REGISTRY (one read-only copy per content key)
+# ===================================================================
+# Sessions that open the same upload share one parsed frame, and sessions with
+# the same filter selection share one filtered view of it. Callers always get
+# a shallow copy: under pandas copy-on-write a session may add or overwrite
+# columns on its copy without touching the shared buffers, so the registered
+# frame itself is never mutated.
+# Each session holds a lease on the dataset it shows; the lease is released
+# when the session switches data or its state is garbage-collected. Leased
+# datasets are never evicted (dropping them frees nothing while a session
+# still holds the frame, and the next viewer would parse a second copy).
+# Unleased datasets, then cached views, go least-recently-used first once the
+# total exceeds REGISTRY_MEM_BYTES.
+
+REGISTRY_MEM_BYTES = int(float(os.environ.get("QA_REGISTRY_MEM_MB", "2048")) * 1024**2)
+MAX_VIEWS_PER_DATASET = 8
+
+class _Dataset:
+    __slots__ = ("df", "nbytes", "refs", "views", "hits", "used")
+
+    def __init__(self, df, nbytes):
+        self.df, self.nbytes, self.refs, self.views, self.hits, self.used = df, nbytes, 0, OrderedDict(), 0, time.time()
+
+    def total(self):
+        return self.nbytes + sum(nb for _, nb in self.views.values())
+
+class DatasetLease:
+    def __init__(self, registry, key, counted):
+        self.key = key
+        # runs once: on release() or when the lease (i.e. the session state holding it) is garbage-collected
+        self._done = weakref.finalize(self, registry._release, key) if counted else None
+
+    def release(self):
+        if self._done: self._done()
+
+class DatasetRegistry:
+    def __init__(self, mem_bytes=REGISTRY_MEM_BYTES):
+        self.mem_bytes = mem_bytes
+        self._d = OrderedDict()             # key -> _Dataset
+        self._lock = threading.RLock()
+        self.stats = {"hit": 0, "miss": 0, "evict": 0, "view_hit": 0, "view_miss": 0}
+
+    @staticmethod
+    def _copy(df):
+        out = df.copy(deep=False)           # shares buffers; copy-on-write on any change
+        out.attrs = dict(df.attrs)
+        return out
+
+    def get(self, key):
+        with self._lock:
+            e = self._d.get(key)
+            if e is None:
+                self.stats["miss"] += 1; return None
+            self._d.move_to_end(key); e.hits += 1; e.used = time.time(); self.stats["hit"] += 1
+            return self._copy(e.df)
+
+    def put(self, key, df):
+        e = _Dataset(self._copy(df), frame_nbytes(df))
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None: e.refs = old.refs
+            self._d[key] = e
+            self._evict()
+        return self._copy(e.df)
+
+    def view(self, key, view_key, build):
+        # build() -> a frame derived from dataset `key` (e.g. a row selection), shared by every session asking for view_key
+        with self._lock:
+            e = self._d.get(key)
+            hit = None if e is None else e.views.get(view_key)
+            if hit is not None:
+                e.views.move_to_end(view_key); e.used = time.time(); self.stats["view_hit"] += 1
+                return self._copy(hit[0])
+            self.stats["view_miss"] += 1
+        out = build()
+        if e is None: return out
+        with self._lock:
+            if self._d.get(key) is e:
+                e.views[view_key] = (self._copy(out), frame_nbytes(out))
+                while len(e.views) > MAX_VIEWS_PER_DATASET: e.views.popitem(last=False)
+                self._evict()
+        return out
+
+    def acquire(self, key):
+        with self._lock:
+            e = self._d.get(key)
+            if e is not None: e.refs += 1
+        return DatasetLease(self, key, e is not None)
+
+    def _release(self, key):
+        with self._lock:
+            e = self._d.get(key)
+            if e is not None and e.refs > 0: e.refs -= 1
+            self._evict()
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(e.total() for e in self._d.values())
+
+    def _evict(self):
+        used = sum(e.total() for e in self._d.values())
+        for key in [k for k, e in self._d.items() if e.refs == 0]:          # unleased, oldest first
+            if used <= self.mem_bytes: return
+            used -= self._d.pop(key).total(); self.stats["evict"] += 1
+        for e in self._d.values():                                          # then views, which can be rebuilt
+            while used > self.mem_bytes and e.views:
+                used -= e.views.popitem(last=False)[1][1]
+
+    def report(self):
+        now = time.time()
+        with self._lock:
+            rows = [{"dataset": k[:10], "rows": len(e.df), "kolom": len(e.df.columns), "MB": e.nbytes / 1024**2,
+                     "view": len(e.views), "MB_view": sum(nb for _, nb in e.views.values()) / 1024**2,
+                     "sesi": e.refs, "hit": e.hits, "idle_s": int(now - e.used)} for k, e in reversed(self._d.items())]
+        return pd.DataFrame(rows, columns=["dataset", "rows", "kolom", "MB", "view", "MB_view", "sesi", "hit", "idle_s"]).round(1)
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_dataset_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None: _registry = DatasetRegistry()
+        return _registry
@@ -0,0 +1,178 @@
+import math
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# PROCESS CAPABILITY (Cp / Cpk / Pp / Ppk, PPM)
+# ===================================================================
+# All measurement columns × strata in one pass per column: rows are sorted once
+# by (stratum, date), so every stratum is a contiguous segment and n, mean,
+# overall σ and the moving range come from reduceat/bincount.
+#   within σ  = MR̄ / d2(2)  (individuals, consecutive readings in date order)
+#   overall σ = sample std
+# Cp/Cpk use within σ, Pp/Ppk overall σ; one-sided specs give Cpk/Ppk only.
+# Expected PPM assumes normality at overall σ; observed PPM counts readings
+# outside spec.
+#
+# Pp/Ppk intervals are percentile bootstraps, drawn for every stratum of a
+# column at once as a (resamples × rows) index matrix in memory-bounded
+# chunks. Strata larger than BOOT_MAX_ROWS are resampled from a random subset
+# of m rows and the interval width is rescaled by √(m/n) around the full-data
+# estimate (m-out-of-n bootstrap); the estimates themselves always use every
+# row. Cp/Cpk are not bootstrapped: iid resampling destroys the reading order
+# the moving range depends on.
+
+D2_MR = 1.128
+N_BOOT = 1000
+BOOT_CONF = 0.95
+BOOT_CHUNK_CELLS = 4_000_000         # resamples × rows gathered per chunk (~32 MB of float64)
+BOOT_MAX_CELLS = 50_000_000          # fewer resamples with many strata (at least MIN_BOOT)
+BOOT_MAX_ROWS = 5_000                # per stratum; larger strata are subsampled
+MIN_BOOT = 200
+MAX_CACHED_TABLES = 16
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+def norm_cdf(z):
+    return 0.5 * _erfc(-np.asarray(z, dtype=float) / math.sqrt(2))
+
+def _spec(specs, col):
+    lsl, usl = specs.get(col, (None, None))
+    f = lambda v: np.nan if v is None or (isinstance(v, float) and math.isnan(v)) else float(v)
+    return f(lsl), f(usl)
+
+def capability_indices(mean, sigma, lsl, usl):
+    # arrays in, (C_p-like, C_pk-like) out; NaN where a spec side or σ is missing
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.where(sigma > 0, sigma, np.nan)
+        cp = (usl - lsl) / (6 * sigma)
+        cpu, cpl = (usl - mean) / (3 * sigma), (mean - lsl) / (3 * sigma)
+    cpk = np.fmin(cpu, cpl)                        # fmin: one-sided specs keep the side that exists
+    return cp, cpk
+
+def expected_ppm(mean, sigma, lsl, usl):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        below = np.where(np.isnan(lsl), 0.0, norm_cdf((lsl - mean) / sigma))
+        above = np.where(np.isnan(usl), 0.0, 1 - norm_cdf((usl - mean) / sigma))
+    return np.where(sigma > 0, (below + above) * 1e6, np.nan)
+
+def _segments(codes):
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, np.int64)
+    return starts, np.diff(np.r_[starts, len(codes)])
+
+def _moments(xs, starts, sizes):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m = np.add.reduceat(xs, starts, axis=-1) / sizes
+        q = np.add.reduceat(xs * xs, starts, axis=-1)
+        return m, np.sqrt(np.maximum(q - sizes * m * m, 0) / (sizes - 1))
+
+def boot_rows(xs, starts, sizes, rng, max_rows=BOOT_MAX_ROWS):
+    # a random subset of at most max_rows readings per stratum, still in contiguous segments
+    if not len(sizes) or sizes.max() <= max_rows: return xs, starts, sizes
+    parts = [xs[s:s + n] if n <= max_rows else xs[s + rng.choice(n, max_rows, replace=False)] for s, n in zip(starts, sizes)]
+    sub_sizes = np.minimum(sizes, max_rows)
+    return np.concatenate(parts), np.r_[0, np.cumsum(sub_sizes)[:-1]], sub_sizes
+
+def bootstrap_pp(xs, starts, sizes, lsl, usl, n_boot=N_BOOT, conf=BOOT_CONF, rng=None):
+    # xs: readings sorted so each stratum is the segment [start, start + size)
+    rng = rng or np.random.default_rng(0)
+    N, G = len(xs), len(starts)
+    if N == 0: return np.full((2, G), np.nan), np.full((2, G), np.nan)
+    n_boot = int(max(min(n_boot, BOOT_MAX_CELLS // N), min(n_boot, MIN_BOOT)))
+    seg_start = np.repeat(starts, sizes); seg_size = np.repeat(sizes, sizes).astype(float)
+    pp, ppk = np.empty((n_boot, G)), np.empty((n_boot, G))
+    step = max(1, BOOT_CHUNK_CELLS // N)
+    for b0 in range(0, n_boot, step):
+        b = min(step, n_boot - b0)
+        idx = seg_start + (rng.random((b, N)) * seg_size).astype(np.int64)
+        m, sd = _moments(xs[idx], starts, sizes)
+        pp[b0:b0 + b], ppk[b0:b0 + b] = capability_indices(m, sd, lsl, usl)
+    q = [(1 - conf) / 2 * 100, (1 + conf) / 2 * 100]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)        # all-NaN strata (n<2 or one-sided Pp)
+        return np.nanpercentile(pp, q, axis=0), np.nanpercentile(ppk, q, axis=0)
+
+def capability_table(df, specs, by=(), order_col=None, n_boot=N_BOOT, conf=BOOT_CONF, seed=0):
+    # specs: {column: (LSL, USL)} with None for a missing side; one output row per column × stratum
+    by = [c for c in by if c in df.columns]
+    cols = [c for c in specs if c in df.columns and any(not np.isnan(v) for v in _spec(specs, c))]
+    if not cols: return pd.DataFrame()
+    if by:
+        gb = df.groupby(by, observed=True, sort=True)
+        codes = gb.ngroup().to_numpy()
+        labels = gb.size().index.to_frame(index=False)
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        labels = pd.DataFrame(index=[0])
+    G = len(labels)
+    if order_col and order_col in df.columns:
+        t = pd.to_datetime(df[order_col], errors="coerce") if not pd.api.types.is_numeric_dtype(df[order_col]) else df[order_col]
+        t = t.to_numpy(dtype="datetime64[ns]").astype(np.int64) if not pd.api.types.is_numeric_dtype(t) else t.to_numpy(dtype=float)
+        perm = np.lexsort((np.arange(len(df)), t, codes))                      # stable within equal dates
+    else:
+        perm = np.argsort(codes, kind="stable")
+    cs_all = codes[perm]
+    rng = np.random.default_rng(seed)
+
+    out = []
+    for col in cols:
+        lsl, usl = _spec(specs, col)
+        xs = df[col].to_numpy(dtype=float, na_value=np.nan)[perm]
+        keep = ~np.isnan(xs) & (cs_all >= 0)
+        xs, cs = xs[keep], cs_all[keep]
+        n = np.bincount(cs, minlength=G).astype(float)
+        s1 = np.bincount(cs, weights=xs, minlength=G)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s1 / n
+            dev = xs - mean[cs]
+            sd_o = np.sqrt(np.bincount(cs, weights=dev * dev, minlength=G) / (n - 1))
+            same = cs[1:] == cs[:-1]
+            mr = np.abs(np.diff(xs))[same]
+            sd_w = np.bincount(cs[1:][same], weights=mr, minlength=G) / np.bincount(cs[1:][same], minlength=G) / D2_MR
+            obs = np.bincount(cs, weights=((xs < lsl) if not np.isnan(lsl) else 0) + ((xs > usl) if not np.isnan(usl) else 0), minlength=G) / n * 1e6
+        sd_o = np.where(n > 1, sd_o, np.nan)
+        cp, cpk = capability_indices(mean, sd_w, lsl, usl)
+        pp, ppk = capability_indices(mean, sd_o, lsl, usl)
+        present = np.flatnonzero(n > 0)
+        ci_pp, ci_ppk = np.full((2, G), np.nan), np.full((2, G), np.nan)
+        if n_boot:
+            sub, starts, sizes = boot_rows(xs, *_segments(cs), rng)
+            lo_hi_pp, lo_hi_ppk = bootstrap_pp(sub, starts, sizes, lsl, usl, n_boot, conf, rng)
+            sub_pp, sub_ppk = capability_indices(*_moments(sub, starts, sizes), lsl, usl)
+            scale = np.sqrt(sizes / n[present])
+            ci_pp[:, present] = pp[present] + (lo_hi_pp - sub_pp) * scale
+            ci_ppk[:, present] = ppk[present] + (lo_hi_ppk - sub_ppk) * scale
+        t = labels.iloc[present].reset_index(drop=True) if by else pd.DataFrame(index=range(len(present)))
+        t.insert(0, "kolom", col)
+        t["LSL"], t["USL"] = lsl, usl
+        t["n"] = n[present].astype(np.int64)
+        t["mean"], t["σ_within"], t["σ_overall"] = mean[present], sd_w[present], sd_o[present]
+        t["Cp"], t["Cpk"], t["Pp"], t["Ppk"] = cp[present], cpk[present], pp[present], ppk[present]
+        t["Pp_low"], t["Pp_high"] = ci_pp[0, present], ci_pp[1, present]
+        t["Ppk_low"], t["Ppk_high"] = ci_ppk[0, present], ci_ppk[1, present]
+        t["PPM_exp"] = expected_ppm(mean[present], sd_o[present], lsl, usl)
+        t["PPM_obs"] = obs[present]
+        out.append(t)
+    return pd.concat(out, ignore_index=True)
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+def get_capability(df, view_key=None, specs=None, by=(), order_col=None, n_boot=N_BOOT, conf=BOOT_CONF):
+    # view_key identifies the filtered rows; the bootstrap is seeded, so a cached table equals a recomputed one
+    specs = {c: _spec(specs, c) for c in (specs or {})}
+    if view_key is None: return capability_table(df, specs, by, order_col, n_boot, conf)
+    key = (view_key, len(df), tuple(sorted(specs.items())), tuple(by), order_col, n_boot, conf)
+    with _tables_lock:
+        t = _tables.get(key)
+        if t is not None:
+            _tables.move_to_end(key); return t
+    t = capability_table(df, specs, by, order_col, n_boot, conf)
+    with _tables_lock:
+        _tables[key] = t
+        while len(_tables) > MAX_CACHED_TABLES: _tables.popitem(last=False)
+    return t
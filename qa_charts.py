@@ -0,0 +1,368 @@
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from qa_trace import note
+
+# ===================================================================
+# FIGURE BUILDERS (Plotly only, no Streamlit)
+# ===================================================================
+# Builders take the ChartResult objects from qa_spc and return (fig, info).
+# Long series switch to WebGL traces and are decimated to MAX_PLOT_POINTS with
+# min-max bucketing (or LTTB); every rule-violation point is always kept.
+# info = {"points": n, "plotted": k, "webgl": bool} for the payload report.
+
+LARGE_SERIES_POINTS = 5_000
+MAX_PLOT_POINTS     = 4_000
+HIST_MAX_RAW_POINTS = 50_000       # above this, histogram bins are computed here instead of in the browser
+DECIMATION          = "minmax"     # "minmax" | "lttb"
+
+minitab_layout = dict(
+    plot_bgcolor='#EBEBEB',
+    paper_bgcolor='white',
+    font=dict(family="Arial", size=12, color="black"),
+    xaxis=dict(showgrid=True, gridcolor='white', gridwidth=1.5, linecolor='gray', zeroline=False, mirror=True),
+    yaxis=dict(showgrid=True, gridcolor='white', gridwidth=1.5, linecolor='gray', zeroline=False, mirror=True),
+)
+
+RULE_SHORT  = {1:'Rule1:3σ', 2:'Rule2:8-run', 3:'Rule3:Trend', 4:'Rule4:Alternate', 5:'Rule5:ZoneA', 6:'Rule6:ZoneB', 7:'Rule7:Stratify', 8:'Rule8:Mixture'}
+RULE_COLORS = {1:'red', 2:'orange', 3:'purple', 4:'brown', 5:'magenta', 6:'goldenrod', 7:'teal', 8:'black'}
+
+# ===================================================================
+# FIGURE CACHE (serialized figure JSON, byte-bounded LRU)
+# ===================================================================
+# Builders decorated with @cached_figure are keyed on a blake2b fingerprint of
+# their inputs (result arrays, the data columns they read) plus chart kind and
+# options. A hit rehydrates the stored JSON without property validation, which
+# is several times cheaper than re-running add_hline/add_trace and validating
+# every trace. Entries are evicted least-recently-used beyond
+# FIGURE_CACHE_BYTES; QA_FIGURE_CACHE_MB=0 disables the cache.
+
+FIGURE_CACHE_BYTES = int(float(os.environ.get("QA_FIGURE_CACHE_MB", "64")) * 1024**2)
+
+def _feed(h, x):
+    if x is None or isinstance(x, (str, bytes, bool, int, float, np.generic)):
+        h.update(repr(x).encode()); return
+    if isinstance(x, np.ndarray):
+        h.update(f"nd{x.dtype.str}{x.shape}".encode())
+        if x.dtype.kind == "O": x = pd.util.hash_array(x.ravel())
+        h.update(np.ascontiguousarray(x).view(np.uint8).data if x.size else b""); return
+    if isinstance(x, pd.Series):
+        h.update(f"s{x.name!r}".encode())
+        if isinstance(x.dtype, pd.CategoricalDtype): _feed(h, x.cat.codes.to_numpy()); _feed(h, x.cat.categories.to_numpy())
+        else: _feed(h, x.to_numpy())
+        return
+    if isinstance(x, pd.Index):
+        _feed(h, x.to_numpy()); return
+    if isinstance(x, pd.DataFrame):
+        h.update(b"df"); _feed(h, list(x.columns))
+        for c in x.columns: _feed(h, x[c])
+        return
+    if dataclasses.is_dataclass(x):
+        h.update(type(x).__name__.encode())
+        for f in dataclasses.fields(x): _feed(h, getattr(x, f.name))
+        return
+    if isinstance(x, dict):
+        h.update(b"{")
+        for k in sorted(x, key=repr): _feed(h, k); _feed(h, x[k])
+        h.update(b"}"); return
+    if isinstance(x, (list, tuple)):
+        h.update(b"(")
+        for v in x: _feed(h, v)
+        h.update(b")"); return
+    h.update(repr(x).encode())
+
+def fingerprint(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts: _feed(h, p)
+    return h.hexdigest()
+
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._d = OrderedDict()             # key -> (json, info)
+        self._used = 0
+        self._lock = threading.Lock()
+        self.stats = {"hit": 0, "miss": 0, "evict": 0}
+
+    def get(self, key):
+        with self._lock:
+            hit = self._d.get(key)
+            if hit is None:
+                self.stats["miss"] += 1; return None
+            self._d.move_to_end(key); self.stats["hit"] += 1
+            return hit
+
+    def put(self, key, js, info=None):
+        if len(js) > self.max_bytes: return
+        with self._lock:
+            if key in self._d: self._used -= len(self._d.pop(key)[0])
+            self._d[key] = (js, info); self._used += len(js)
+            while self._used > self.max_bytes and self._d:
+                _, (old, _) = self._d.popitem(last=False); self._used -= len(old); self.stats["evict"] += 1
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._d), "MB": self._used / 1024**2}
+
+    def clear(self):
+        with self._lock:
+            self._d.clear(); self._used = 0
+
+_figure_cache = FigureCache()
+
+def get_figure_cache():
+    return _figure_cache
+
+def cached_figure(kind, key=None):
+    # key(*args, **kwargs) -> the inputs that determine the figure; default: all arguments
+    def deco(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            cache = _figure_cache
+            if not cache.max_bytes: return build(*args, **kwargs)
+            k = (kind, fingerprint(key(*args, **kwargs) if key else (args, kwargs)))
+            hit = cache.get(k)
+            note(figure_cache="hit" if hit is not None else "miss")
+            if hit is not None:
+                js, info = hit
+                fig = go.Figure(json.loads(js), _validate=False)
+                return fig if info is None else (fig, dict(info))
+            out = build(*args, **kwargs)
+            fig, info = out if isinstance(out, tuple) else (out, None)
+            cache.put(k, pio.to_json(fig, validate=False), info)
+            return out
+        return wrapper
+    return deco
+
+# -- decimation --
+def _numeric_x(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64): return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    if np.issubdtype(x.dtype, np.number): return x.astype(float)
+    return np.arange(len(x), dtype=float)
+
+def minmax_indices(y, n_out):
+    n = len(y)
+    if n <= n_out: return np.arange(n)
+    edges = np.unique(np.linspace(0, n, max(n_out // 2, 1) + 1).astype(np.int64))
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    order = np.lexsort((np.nan_to_num(y, nan=np.inf), bucket))   # by bucket, then value
+    return np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1], [0, n - 1]]))
+
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n <= n_out or n_out < 3: return np.arange(n)
+    x = _numeric_x(x); y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64); out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        ax, ay = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - ax) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ay - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        out[i + 1] = a
+    return out
+
+def decimate(cs, max_points=MAX_PLOT_POINTS, method=DECIMATION):
+    # None when the series is small enough to send as-is
+    n = len(cs.values)
+    if n <= max(LARGE_SERIES_POINTS, max_points): return None
+    keep = minmax_indices(cs.values, max_points) if method == "minmax" else lttb_indices(cs.x, cs.values, max_points)
+    viol = [v for v in cs.violations.values() if len(v)]
+    return np.union1d(keep, np.concatenate(viol)) if viol else keep
+
+def _take(a, idx):
+    a = np.asarray(a)
+    return a if idx is None or a.ndim == 0 else a[idx]
+
+def figure_payload_bytes(fig):
+    return len(pio.to_json(fig, validate=False))
+
+# -- building blocks --
+def add_ctrl_lines(fig, dates, ucl, lcl, cl, row=None):
+    sigma = (ucl - cl) / 3 if ucl != cl else 1e-9
+    if row is None:
+        for mult, c in [(2, "rgba(255,165,0,0.3)"), (1, "rgba(0,128,0,0.2)")]:
+            fig.add_hline(y=cl + mult*sigma, line_dash="dot", line_color=c, line_width=1)
+            if cl - mult*sigma > 0:
+                fig.add_hline(y=cl - mult*sigma, line_dash="dot", line_color=c, line_width=1)
+        fig.add_hline(y=ucl, line_dash="dash", line_color="red", line_width=1.5, annotation_text=f"UCL={ucl:.4f}", annotation_position="top right")
+        fig.add_hline(y=lcl, line_dash="dash", line_color="red", line_width=1.5, annotation_text=f"LCL={lcl:.4f}", annotation_position="bottom right")
+        fig.add_hline(y=cl, line_color="green", line_width=2, annotation_text=f"CL={cl:.4f}", annotation_position="top left")
+    else:
+        yref = "y" if row == 1 else f"y{row}"
+        lines = [
+            (ucl, "red", "dash", f"UCL={ucl:.4f}"), (lcl, "red", "dash", f"LCL={lcl:.4f}"), (cl, "green", "solid", f"CL={cl:.4f}"),
+            (cl + sigma, "rgba(0,128,0,0.5)", "dot", ""), (cl - sigma, "rgba(0,128,0,0.5)", "dot", ""),
+            (cl + 2*sigma, "rgba(255,165,0,0.6)", "dot", ""), (cl - 2*sigma, "rgba(255,165,0,0.6)", "dot", "")
+        ]
+        for y_val, color, dash, label in lines:
+            if y_val < 0: continue
+            fig.add_shape(type="line", xref="paper", x0=0, x1=1, yref=yref, y0=y_val, y1=y_val, line=dict(color=color, width=2 if dash=="solid" else 1, dash="dash" if dash=="dash" else ("dot" if dash=="dot" else "solid")))
+            if label: fig.add_annotation(xref="paper", x=1.01, yref=yref, y=y_val, text=label, showarrow=False, font=dict(size=9, color=color), xanchor="left")
+
+def add_ctrl_steps(fig, cs, row, idx=None):
+    # per-point limits in a subplot (X̄-R / X̄-S with unequal subgroup sizes)
+    Scatter = go.Scatter if idx is None else go.Scattergl
+    x = _take(cs.x, idx)
+    for y, color, dash, name in ((cs.ucl, "red", "dash", "UCL"), (cs.lcl, "red", "dash", "LCL"), (cs.cl, "green", "solid", "CL")):
+        y = _take(np.broadcast_to(np.asarray(y, dtype=float), np.shape(cs.values)), idx)
+        fig.add_trace(Scatter(x=x, y=y, mode="lines", name=name, showlegend=False, line=dict(color=color, dash=dash, width=2 if dash == "solid" else 1.5, shape="hv")), row=row, col=1)
+
+def plot_violations(fig, dates, values, violations, name, row=None, idx=None):
+    trace_kwargs = {} if row is None else {"row": row, "col": 1}
+    Scatter = go.Scatter if idx is None else go.Scattergl
+    dates_a, values_a = np.asarray(dates), np.asarray(values)
+    fig.add_trace(Scatter(x=_take(dates_a, idx), y=_take(values_a, idx), mode='lines+markers', name=name, line=dict(color='#1e3d59', width=2), marker=dict(color='#1e3d59', size=6 if idx is None else 3)), **trace_kwargs)
+    for rule, idxs in violations.items():
+        idxs = idxs[idxs < min(len(dates_a), len(values_a))]
+        if len(idxs):
+            fig.add_trace(Scatter(x=dates_a[idxs], y=values_a[idxs], mode='markers', name=RULE_SHORT[rule], marker=dict(color=RULE_COLORS[rule], size=12, symbol='x', line=dict(width=2))), **trace_kwargs)
+
+def add_limit_band(fig, cs, idx=None):
+    x, ucl, lcl = _take(cs.x, idx), _take(cs.ucl, idx), _take(cs.lcl, idx)
+    Scatter = go.Scatter if idx is None else go.Scattergl
+    fig.add_trace(go.Scatter(x=np.concatenate([x, x[::-1]]), y=np.concatenate([ucl, lcl[::-1]]), fill='toself', fillcolor='rgba(255,0,0,0.06)', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(Scatter(x=x, y=ucl, mode='lines', line=dict(dash='dash',color='red',width=1.5), name='UCL'))
+    fig.add_trace(Scatter(x=x, y=lcl, mode='lines', line=dict(dash='dash',color='red',width=1.5), name='LCL'))
+
+def _info(*pairs):
+    return {"points": sum(len(cs.values) for cs, _ in pairs),
+            "plotted": sum(len(cs.values) if idx is None else len(idx) for cs, idx in pairs),
+            "webgl": any(idx is not None for _, idx in pairs)}
+
+# -- chart builders --
+@cached_figure("varying_limit")
+def build_varying_limit_chart(res, title, yaxis_title, cl_label, height=400, rule_traces=False, max_points=MAX_PLOT_POINTS):
+    # p- and u-charts: per-point limits drawn as a band
+    cs = res.series[0]
+    idx = decimate(cs, max_points)
+    Scatter = go.Scatter if idx is None else go.Scattergl
+    fig = go.Figure()
+    add_limit_band(fig, cs, idx)
+    fig.add_hline(y=cs.cl, line_color='green', line_width=2, annotation_text=f"{cl_label}={cs.cl:.4f}")
+    x, y = _take(cs.x, idx), _take(cs.values, idx)
+    colors = np.where(np.isin(np.arange(len(cs.values)) if idx is None else idx, cs.violations[1]), 'red', '#1e3d59')
+    fig.add_trace(Scatter(x=x, y=y, mode='lines+markers', name=cs.name, line=dict(color='#1e3d59', width=2), marker=dict(color=colors, size=8 if idx is None else 4)))
+    if rule_traces:
+        for r, idxs in cs.violations.items():
+            if len(idxs):
+                fig.add_trace(Scatter(x=cs.x[idxs], y=cs.values[idxs], mode='markers', name=f'Rule {r}', marker=dict(color=RULE_COLORS[r], size=12, symbol='x', line=dict(width=2))))
+    fig.update_layout(title=title, height=height, yaxis_title=yaxis_title)
+    return fig, _info((cs, idx))
+
+@cached_figure("fixed_limit")
+def build_fixed_limit_chart(res, title, yaxis_title, height=400, max_points=MAX_PLOT_POINTS):
+    cs = res.series[0]
+    idx = decimate(cs, max_points)
+    fig = go.Figure()
+    add_ctrl_lines(fig, cs.x, cs.ucl, cs.lcl, cs.cl)
+    plot_violations(fig, cs.x, cs.values, cs.violations, cs.name, idx=idx)
+    fig.update_layout(title=title, height=height, yaxis_title=yaxis_title)
+    return fig, _info((cs, idx))
+
+@cached_figure("two_panel")
+def build_two_panel_chart(res, titles, title_text, max_points=MAX_PLOT_POINTS):
+    top, bottom = res.series
+    i_top, i_bot = decimate(top, max_points), decimate(bottom, max_points)
+    fig = make_subplots(rows=2, cols=1, subplot_titles=titles, vertical_spacing=0.12)
+    for cs, row, idx in ((top, 1, i_top), (bottom, 2, i_bot)):
+        if np.ndim(cs.ucl) or np.ndim(cs.cl): add_ctrl_steps(fig, cs, row, idx)
+        else: add_ctrl_lines(fig, cs.x, cs.ucl, cs.lcl, cs.cl, row=row)
+    plot_violations(fig, top.x, top.values, top.violations, top.name, row=1, idx=i_top)
+    plot_violations(fig, bottom.x, bottom.values, bottom.violations, bottom.name, row=2, idx=i_bot)
+    fig.update_layout(height=600, title_text=title_text)
+    return fig, _info((top, i_top), (bottom, i_bot))
+
+@cached_figure("pareto")
+def render_pareto_chart(pareto, cat_col, val_col):
+    # pareto: one row per category, sorted by val_col descending
+    cum_pct = pareto[val_col].cumsum() / pareto[val_col].sum() * 100
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=pareto[cat_col], y=pareto[val_col], name="Frekuensi", marker_color="#00529B", text=pareto[val_col], textposition='outside'))
+    fig.add_trace(go.Scatter(x=pareto[cat_col], y=cum_pct, mode='lines+markers', name="Kumulatif %", yaxis="y2", line=dict(color="red", width=2)))
+    fig.add_hline(y=80, line_dash="dot", line_color="orange", annotation_text="80% (Pareto)", yref="y2")
+    fig.update_layout(title="Pareto Chart — Frekuensi Defect", yaxis=dict(title="Jumlah NG"), yaxis2=dict(title="Kumulatif %", overlaying="y", side="right", range=[0,105]), height=420)
+    return fig
+
+# ----------------- HISTOGRAM & SCATTER (MINITAB STYLE) -----------------
+@cached_figure("histogram", lambda df, col, spec=None: (df[col], spec))
+def render_minitab_histogram(df, col, spec=None):
+    data = df[col].dropna()
+    mean, std = data.mean(), data.std()
+
+    fig = go.Figure()
+    if len(data) <= HIST_MAX_RAW_POINTS:
+        fig.add_trace(go.Histogram(
+            x=data, histnorm='probability density',
+            marker=dict(color='#00529B', line=dict(color='black', width=1)),
+            name='Data', opacity=0.75
+        ))
+    else:
+        # ship bin heights instead of every raw value
+        vals = data.to_numpy(dtype=float)
+        edges = np.histogram_bin_edges(vals, bins="auto")
+        if len(edges) > 201: edges = np.linspace(vals.min(), vals.max(), 201)
+        dens, edges = np.histogram(vals, bins=edges, density=True)
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2, y=dens, width=np.diff(edges),
+            marker=dict(color='#00529B', line=dict(color='black', width=1)),
+            name='Data', opacity=0.75
+        ))
+        fig.update_layout(bargap=0)
+
+    if std > 0:
+        xmin, xmax = data.min(), data.max()
+        x_fit = np.linspace(xmin, xmax, 100)
+        y_fit = np.exp(-0.5 * ((x_fit - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi))
+        fig.add_trace(go.Scatter(x=x_fit, y=y_fit, mode='lines', line=dict(color='red', width=2.5), name='Normal Fit'))
+
+    for v, label in zip(spec or (), ("LSL", "USL")):
+        if v is not None: fig.add_vline(x=v, line_dash="dash", line_color="darkorange", annotation_text=label)
+
+    stats_text = f"<b>Mean:</b> {mean:.3f}<br><b>StDev:</b> {std:.3f}<br><b>N:</b> {len(data)}"
+    fig.add_annotation(
+        xref="paper", yref="paper", x=0.98, y=0.98, text=stats_text,
+        showarrow=False, align="left", bgcolor="white", bordercolor="black", borderwidth=1, font=dict(size=12)
+    )
+    fig.update_layout(title=f"Histogram of {col} (Normal Curve)", yaxis_title="Density", xaxis_title=col, **minitab_layout, height=450)
+    return fig
+
+def add_fit_line(fig, fit, x_range):
+    # fit = {"slope", "intercept"} from precomputed sufficient statistics (qa_corr), no refit here
+    if not fit or not np.isfinite(fit["slope"]) or not np.all(np.isfinite(x_range)): return
+    xs = np.asarray(x_range, dtype=float)
+    fig.add_trace(go.Scatter(x=xs, y=fit["intercept"] + fit["slope"] * xs, mode='lines', line=dict(color='red', width=2.5), name='OLS Fit'))
+
+@cached_figure("scatter", lambda df, x_col, y_col, color_col=None, *a, **kw: (df[[c for c in (x_col, y_col, color_col) if c]], a, kw))
+def render_minitab_scatter(df, x_col, y_col, color_col=None, fit=None, x_range=None, title_note=""):
+    fig = px.scatter(df, x=x_col, y=y_col, color=color_col, render_mode="webgl" if len(df) > LARGE_SERIES_POINTS else "auto")
+    fig.update_traces(marker=dict(size=8, color='#00529B' if not color_col else None, line=dict(width=1, color='DarkSlateGrey')), selector=dict(mode='markers'))
+    add_fit_line(fig, fit, x_range if x_range is not None else (df[x_col].min(), df[x_col].max()))
+    fig.update_layout(title=f"Scatterplot of {y_col} vs {x_col}{title_note}", **minitab_layout, height=500)
+    return fig
+
+@cached_figure("density_scatter")
+def render_density_scatter(grid, x_col, y_col, fit=None, x_range=None):
+    # grid = (counts[y, x], x centres, y centres) from qa_corr.density_grid; empty bins stay transparent
+    counts, xc, yc = grid
+    fig = go.Figure(go.Heatmap(x=xc, y=yc, z=np.where(counts > 0, counts, np.nan), colorscale="Blues", colorbar=dict(title="n"),
+                               hovertemplate=f"{x_col}: %{{x:.4g}}<br>{y_col}: %{{y:.4g}}<br>n: %{{z}}<extra></extra>"))
+    add_fit_line(fig, fit, x_range if x_range is not None else (xc[0], xc[-1]))
+    fig.update_layout(title=f"Density Scatter of {y_col} vs {x_col} ({int(counts.sum()):,} titik)", **minitab_layout, height=500)
+    fig.update_xaxes(title_text=x_col); fig.update_yaxes(title_text=y_col)
+    return fig
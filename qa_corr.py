@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# CORRELATION SUFFICIENT STATISTICS (pairwise, computed once per view)
+# ===================================================================
+# For k numeric columns, four k×k matrix products over the rows give every
+# pairwise statistic with pairwise-complete rows (like DataFrame.corr()):
+#   N[i,j]   = rows where i and j are both present
+#   S[i,j]   = Σ x_i   over those rows
+#   Q[i,j]   = Σ x_i²  over those rows
+#   P[i,j]   = Σ x_i·x_j
+# Columns are shifted by their mean first so the products do not cancel.
+# The correlation matrix, r and the least-squares line for any pair are then
+# O(1) lookups, so the scatter section never refits on a rerun. Rows are
+# processed in chunks to bound the dense float copy.
+
+STATS_CHUNK_ROWS = 200_000
+MAX_CACHED_STATS = 8
+
+class CorrStats:
+    def __init__(self, df, cols, chunk_rows=STATS_CHUNK_ROWS):
+        self.cols = list(cols)
+        self.pos = {c: i for i, c in enumerate(self.cols)}
+        k = len(self.cols)
+        self.shift = np.array([df[c].mean() if len(df) else 0.0 for c in self.cols], dtype=float)
+        self.shift = np.nan_to_num(self.shift)
+        self.lo, self.hi = np.full(k, np.inf), np.full(k, -np.inf)
+        N, S, Q, P = (np.zeros((k, k)) for _ in range(4))
+        for start in range(0, len(df), chunk_rows):
+            block = df.iloc[start:start + chunk_rows]
+            X = np.column_stack([block[c].to_numpy(dtype=float, na_value=np.nan) for c in self.cols]) - self.shift
+            M = ~np.isnan(X)
+            if M.all():                                     # no gaps: the masked products reduce to column sums
+                self.lo, self.hi = np.fmin(self.lo, X.min(axis=0)), np.fmax(self.hi, X.max(axis=0))
+                N += len(X); S += X.sum(axis=0)[:, None]; Q += (X * X).sum(axis=0)[:, None]; P += X.T @ X
+                continue
+            self.lo = np.fmin(self.lo, np.where(M, X, np.inf).min(axis=0))
+            self.hi = np.fmax(self.hi, np.where(M, X, -np.inf).max(axis=0))
+            Mf = M.astype(float)
+            X = np.where(M, X, 0.0)
+            N += Mf.T @ Mf; S += X.T @ Mf; Q += (X * X).T @ Mf; P += X.T @ X
+        self.N, self.S, self.Q, self.P = N, S, Q, P
+        self.lo, self.hi = self.lo + self.shift, self.hi + self.shift
+        self._corr = None
+
+    def _pair(self, i, j):
+        # n, centred means, variances and covariance of (x_i, x_j) over their common rows
+        n = self.N[i, j]
+        if n < 2: return n, np.nan, np.nan, np.nan, np.nan, np.nan
+        mx, my = self.S[i, j] / n, self.S[j, i] / n
+        vx, vy = self.Q[i, j] / n - mx * mx, self.Q[j, i] / n - my * my
+        return n, mx, my, vx, vy, self.P[i, j] / n - mx * my
+
+    def corr(self):
+        if self._corr is None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                n = self.N
+                mx, q = self.S / n, self.Q / n
+                vx = q - mx * mx
+                cov = self.P / n - mx * mx.T
+                r = cov / np.sqrt(vx * vx.T)
+            r = np.where(n >= 2, np.clip(r, -1, 1), np.nan)
+            np.fill_diagonal(r, np.where(np.diag(vx) > 0, 1.0, np.nan))
+            self._corr = pd.DataFrame(r, index=self.cols, columns=self.cols)
+        return self._corr
+
+    def regression(self, x_col, y_col):
+        # least-squares y = a + b·x and Pearson r over rows where both are present
+        i, j = self.pos[x_col], self.pos[y_col]
+        n, mx, my, vx, vy, cov = self._pair(i, j)
+        if not (vx > 0): return {"n": int(n), "slope": np.nan, "intercept": np.nan, "r": np.nan}
+        b = cov / vx
+        a = (my + self.shift[j]) - b * (mx + self.shift[i])
+        r = cov / np.sqrt(vx * vy) if vy > 0 else np.nan
+        return {"n": int(n), "slope": float(b), "intercept": float(a), "r": float(np.clip(r, -1, 1))}
+
+    def x_range(self, col):
+        i = self.pos[col]
+        return (self.lo[i], self.hi[i]) if self.lo[i] <= self.hi[i] else (np.nan, np.nan)
+
+_stats = OrderedDict()
+_stats_lock = threading.Lock()
+
+def get_corr_stats(df, view_key=None, cols=()):
+    # view_key identifies the filtered rows (dataset content key + filter selections)
+    cols = tuple(cols)
+    if view_key is None: return CorrStats(df, cols)
+    key = (view_key, len(df), cols)
+    with _stats_lock:
+        st = _stats.get(key)
+        if st is not None:
+            _stats.move_to_end(key); return st
+    st = CorrStats(df, cols)
+    with _stats_lock:
+        _stats[key] = st
+        while len(_stats) > MAX_CACHED_STATS: _stats.popitem(last=False)
+    return st
+
+# ===================================================================
+# LARGE-DATA SCATTER (binned density / stratified sample)
+# ===================================================================
+# Past SCATTER_MAX_POINTS rows the browser gets either a 2-D histogram of the
+# pair or, when points are coloured by a group, a sample drawn per group so
+# small groups stay visible.
+
+SCATTER_MAX_POINTS = 20_000
+DENSITY_BINS = 120
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    ok = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[ok], y[ok]
+    if not len(x): return None
+    counts, xe, ye = np.histogram2d(x, y, bins=bins)
+    return counts.T, (xe[:-1] + xe[1:]) / 2, (ye[:-1] + ye[1:]) / 2
+
+def stratified_sample(df, group_col, n_max=SCATTER_MAX_POINTS, seed=0):
+    # every group first gets up to n_max / groups rows, the rest is shared in proportion to what is left
+    codes = pd.factorize(df[group_col], use_na_sentinel=False)[0]
+    sizes = np.bincount(codes)
+    take = np.minimum(sizes, n_max // max(1, len(sizes)))
+    left = sizes - take
+    if left.sum(): take += np.minimum(left, (left * ((n_max - take.sum()) / left.sum())).astype(np.int64))
+    rng = np.random.default_rng(seed)
+    order = np.argsort(codes, kind="stable")
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    pos = np.concatenate([order[s + rng.choice(n, t, replace=False)] for s, n, t in zip(starts, sizes, take) if t])
+    return df.iloc[np.sort(pos)]
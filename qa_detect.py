@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from qa_cache import content_key
+from qa_ingest import sample_series
+
+DETECT_SAMPLE_ROWS = 5000
+
+# ===================================================================
+# SMART COLUMN DETECTOR
+# ===================================================================
+ROLE_KEYWORDS = {
+    "date":          ["tanggal","date","tgl","waktu","time","periode","period","datetime","hari","day","bulan","month","tahun","year","timestamp"],
+    "sample_size":   ["qty_check","qty check","quantity check","n_check","jumlah cek","jumlah check","sample size","sample_size","inspeksi","checked","total check","n_inspeksi","jumlah_inspeksi","n_sample","lot size","batch size"],
+    "defect_count":  ["qty_ng","qty ng","jumlah ng","ng","defect","defects","reject","rejected","jumlah reject","cacat","banyak cacat","n_defect","count_defect","defect_count","nonconforming","nc"],
+    "defect_type":   ["jenis_defect","jenis defect","jenis_cacat","jenis cacat","tipe defect","type defect","defect type","jenis reject","reject type","mode kegagalan","failure mode","cacat_type"],
+    "measurement":   ["diameter","panjang","lebar","tinggi","berat","suhu","tekanan","tebal","kedalaman","ukuran","dimensi","length","width","height","weight","temperature","pressure","thickness","depth","size","dimension","mm","cm","gram","kg","celcius","fahrenheit","ohm","volt","ampere","rpm","kpa","mpa","psi"],
+    "line":          ["line","lini","mesin","machine","operator","shift","area","station","workstation","pos","position","proses","process"],
+    "product":       ["produk","product","tipe_produk","tipe produk","type","model","sku","part","part_no","part_number","item","artikel"],
+    "size_variant":  ["ukuran","size","variant","varian","spec","spesifikasi","grade"],
+}
+
+def normalize(s):
+    return re.sub(r'[\s_]+', ' ', str(s).lower().strip())
+
+# One regex tests every role at once: each role is an optional lookahead with a
+# named group, so match().groupdict() lists all roles whose keywords occur in
+# the name. (kw == cn / startswith / substring all reduce to substring.)
+def _compile_role_matcher(role_keywords):
+    parts = [f"(?:(?=.*?(?P<{role}>{'|'.join(map(re.escape, kws))})))?" for role, kws in role_keywords.items()]
+    return re.compile("".join(parts), re.S)
+
+ROLE_MATCHER = _compile_role_matcher(ROLE_KEYWORDS)
+TYPED_ROLES  = ("sample_size", "defect_count", "measurement")     # keyword match only counts for numeric columns
+
+@lru_cache(maxsize=4096)
+def keyword_roles(cn):
+    return tuple(r for r, v in ROLE_MATCHER.match(cn).groupdict().items() if v is not None)
+
+def detect_column_role(col_name, series: pd.Series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date"
+
+    is_num = pd.api.types.is_numeric_dtype(series)
+    for role in keyword_roles(normalize(col_name)):
+        if role in TYPED_ROLES and not is_num: continue
+        return role
+
+    # statistics below only ever look at a bounded sample of the column
+    sample = sample_series(series, DETECT_SAMPLE_ROWS)
+    if is_num:
+        vmax  = sample.max()
+        vmean = sample.mean()
+        if pd.api.types.is_integer_dtype(series) or (np.mod(sample.to_numpy(dtype=float), 1) == 0).all():
+            if vmax < 100000 and vmean < 10000:
+                return "numeric_count"
+        return "measurement"
+
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        nuniq = sample.nunique()
+        nrows = len(sample)
+        if nuniq < 20 and nrows > 0 and nuniq / nrows < 0.3:
+            return "categorical"
+
+    return "unknown"
+
+def auto_detect_all_columns(df):
+    detected = {}
+    for col in df.columns:
+        detected[col] = detect_column_role(col, df[col])
+    return detected
+
+def resolve_mapping(df, detected):
+    mapping = {
+        "date": None, "sample_size": None, "defect_count": None, "defect_type": None,
+        "measurement": [], "line": None, "product": None, "size_variant": None, "categorical": [],
+    }
+    for col, role in detected.items():
+        if role == "date" and mapping["date"] is None: mapping["date"] = col
+        elif role == "sample_size" and mapping["sample_size"] is None: mapping["sample_size"] = col
+        elif role == "defect_count" and mapping["defect_count"] is None: mapping["defect_count"] = col
+        elif role == "defect_type" and mapping["defect_type"] is None: mapping["defect_type"] = col
+        elif role == "measurement": mapping["measurement"].append(col)
+        elif role == "line" and mapping["line"] is None: mapping["line"] = col
+        elif role == "product" and mapping["product"] is None: mapping["product"] = col
+        elif role == "size_variant" and mapping["size_variant"] is None: mapping["size_variant"] = col
+        elif role == "categorical": mapping["categorical"].append(col)
+        elif role == "numeric_count":
+            if mapping["sample_size"] is None: mapping["sample_size"] = col
+            elif mapping["defect_count"] is None: mapping["defect_count"] = col
+    return mapping
+
+def classify_dataset_type(mapping):
+    has_attr = mapping["sample_size"] and mapping["defect_count"]
+    has_var  = len(mapping["measurement"]) > 0
+    if has_attr and has_var: return "mixed"
+    if has_attr: return "attribute"
+    if has_var: return "variable"
+    return "unknown"
+
+# ===================================================================
+# MAPPING PROFILES (SCHEMA FINGERPRINT)
+# ===================================================================
+# A confirmed mapping is saved under a fingerprint of the column names and
+# coarse dtype families (text/number/datetime/bool), so the next export from
+# the same source skips detection and opens with the corrected mapping.
+# Families rather than exact dtypes: int8 vs int64 or category vs str depend on
+# the values in a particular file, not on the schema.
+PROFILE_PATH = os.environ.get("QA_PROFILE_PATH", os.path.join(os.path.expanduser("~"), ".local", "share", "qa_system", "mapping_profiles.json"))
+
+def dtype_family(s):
+    if pd.api.types.is_datetime64_any_dtype(s): return "datetime"
+    if pd.api.types.is_bool_dtype(s): return "bool"
+    if pd.api.types.is_numeric_dtype(s): return "number"
+    return "text"
+
+def schema_fingerprint(df):
+    cols = sorted(f"{c}\t{dtype_family(df[c])}" for c in df.columns if not str(c).startswith("_"))
+    return content_key("\n".join(cols).encode())[:16]
+
+class MappingProfiles:
+    def __init__(self, path=PROFILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data, self._mtime = {}, None
+
+    def token(self):
+        try: return os.stat(self.path).st_mtime_ns
+        except OSError: return 0
+
+    def _load(self):
+        mtime = self.token()
+        if mtime != self._mtime:
+            try:
+                with open(self.path, encoding="utf-8") as f: self._data = json.load(f)
+            except (OSError, ValueError): self._data = {}
+            self._mtime = mtime
+        return self._data
+
+    def get(self, fingerprint):
+        with self._lock: return self._load().get(fingerprint)
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._data, self._mtime = data, self.token()
+
+    def save(self, fingerprint, detected, mapping, columns=None):
+        with self._lock:
+            data = dict(self._load())
+            data[fingerprint] = {"detected": {str(c): r for c, r in detected.items()}, "mapping": mapping,
+                                 "columns": list(columns or detected), "saved": datetime.now().isoformat(timespec="seconds")}
+            self._write(data)
+
+    def delete(self, fingerprint):
+        with self._lock:
+            data = dict(self._load())
+            if data.pop(fingerprint, None) is not None: self._write(data)
+
+def apply_profile(df, profile):
+    # profile columns are matched by name; anything no longer present falls back to auto-detection
+    detected = {c: profile["detected"].get(str(c)) or detect_column_role(c, df[c]) for c in df.columns}
+    mapping = resolve_mapping(df, detected)
+    for k, v in profile["mapping"].items():
+        if isinstance(v, list): mapping[k] = [c for c in v if c in df.columns]
+        elif v is None or v in df.columns: mapping[k] = v
+    return detected, mapping
+
+_profiles = {}
+
+def get_mapping_profiles(path=PROFILE_PATH):
+    if path not in _profiles: _profiles[path] = MappingProfiles(path)
+    return _profiles[path]
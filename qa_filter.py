@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# INDEXED GLOBAL FILTER
+# ===================================================================
+# Each filter column, and the calendar month of the date column, is
+# dictionary-encoded once per loaded dataset: int32 codes per row (-1 = missing)
+# plus sorted string labels for the widgets. After that, selecting values is a
+# lookup-table gather (lut[codes]) that is cached per (column, selection), and
+# combining filters is a boolean AND. No per-rerun astype(str) or strftime.
+
+MONTH_KEY = "_Bulan"
+MAX_CACHED_MASKS = 64
+
+def encode_column(s):
+    try:
+        codes, uniques = pd.factorize(s, sort=True)
+        labels = pd.Index(uniques).astype(str)
+        if labels.has_duplicates: raise TypeError      # 1 and "1" would show as the same option
+    except TypeError:
+        codes, uniques = pd.factorize(s.astype(str).where(s.notna()), sort=True)
+        labels = pd.Index(uniques)
+    return codes.astype(np.int32), np.asarray(labels, dtype=object)
+
+def encode_months(s):
+    d = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+    month = (d.dt.year * 12 + d.dt.month - 1).to_numpy(dtype=float, na_value=np.nan)
+    ok = ~np.isnan(month)
+    uniq, inv = np.unique(month[ok].astype(np.int64), return_inverse=True)
+    codes = np.full(len(d), -1, dtype=np.int32); codes[ok] = inv
+    labels = np.array([pd.Timestamp(year=int(m // 12), month=int(m % 12) + 1, day=1).strftime("%b %Y") for m in uniq], dtype=object)
+    return codes, labels
+
+class FilterIndex:
+    def __init__(self, df, cols, date_col=None):
+        self.n = len(df)
+        self.codes, self.labels = {}, {}
+        for c in cols:
+            self.codes[c], self.labels[c] = encode_column(df[c])
+        if date_col and date_col in df.columns:
+            self.codes[MONTH_KEY], self.labels[MONTH_KEY] = encode_months(df[date_col])
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def options(self, col):
+        return list(self.labels.get(col, ()))
+
+    def mask(self, col, selected):
+        key = (col, frozenset(selected))
+        with self._lock:
+            m = self._masks.get(key)
+            if m is not None:
+                self._masks.move_to_end(key); return m
+        lut = np.zeros(len(self.labels[col]) + 1, dtype=bool)   # last slot catches code -1
+        lut[np.flatnonzero(np.isin(self.labels[col], list(selected)))] = True
+        m = lut[self.codes[col]]
+        m.flags.writeable = False
+        with self._lock:
+            self._masks[key] = m
+            while len(self._masks) > MAX_CACHED_MASKS: self._masks.popitem(last=False)
+        return m
+
+    def select(self, selections):
+        # {col: [labels]}; empty selection = no filter on that column; None = nothing filtered
+        out = None
+        for col, sel in selections.items():
+            if not sel or col not in self.codes: continue
+            m = self.mask(col, sel)
+            out = m.copy() if out is None else np.logical_and(out, m, out=out)
+        return out
+
+    def month_column(self, rows=None):
+        codes = self.codes[MONTH_KEY] if rows is None else self.codes[MONTH_KEY][rows]
+        return pd.Categorical.from_codes(codes, categories=self.labels[MONTH_KEY], ordered=True)
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+MAX_CACHED_INDEXES = 8
+
+def get_filter_index(df, cols, date_col=None):
+    # keyed on the dataset's content key (set by the loaders), so reruns reuse the encoding
+    src = df.attrs.get("qa_source_key")
+    if src is None: return FilterIndex(df, cols, date_col)
+    key = (src, len(df), tuple(cols), date_col)
+    with _indexes_lock:
+        idx = _indexes.get(key)
+        if idx is not None:
+            _indexes.move_to_end(key); return idx
+    idx = FilterIndex(df, cols, date_col)
+    with _indexes_lock:
+        _indexes[key] = idx
+        while len(_indexes) > MAX_CACHED_INDEXES: _indexes.popitem(last=False)
+    return idx
@@ -0,0 +1,283 @@
+import io
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from qa_cache import content_key, get_dataset_registry, get_parse_cache
+from qa_trace import span
+
+# ===================================================================
+# FILE INGESTION
+# ===================================================================
+# Bump when parsing/coercion changes so stale on-disk cache entries are not reused.
+PARSER_VERSION = 3
+
+EXCEL_EXT = ("xlsx", "xlsm", "xls")
+
+def file_ext(name):
+    return name.lower().split(".")[-1]
+
+def reader_options(name):
+    ext = file_ext(name)
+    if ext in EXCEL_EXT: return {"kind": "excel"}
+    return {"kind": "csv", "sep": "\t" if ext == "tsv" else ","}
+
+# ===================================================================
+# SAMPLE-BASED TYPE INFERENCE
+# ===================================================================
+# Datetime detection is decided on a bounded sample: one explicit format must
+# parse every sampled value, and only then is the full column parsed, once, with
+# that format. Text columns are rejected after looking at the sample only.
+INFER_SAMPLE_ROWS = 1000
+
+DATETIME_FORMATS = [
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d", "%Y/%m/%d %H:%M:%S",
+    "%d/%m/%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%m/%d/%Y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S",
+    "%d-%m-%Y", "%d-%m-%Y %H:%M:%S", "%d.%m.%Y", "%d %b %Y", "%d %B %Y", "%b %Y", "%Y%m%d",
+]
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    guess_datetime_format = None
+
+def sample_series(s, n=INFER_SAMPLE_ROWS):
+    # head plus evenly spaced rows, so sorted or blocky exports are still represented
+    if len(s) <= n: return s.dropna()
+    pos = np.unique(np.concatenate([np.arange(n // 4), np.linspace(0, len(s) - 1, n - n // 4).astype(np.int64)]))
+    return s.iloc[pos].dropna()
+
+def _candidate_formats(sample):
+    cands = []
+    if guess_datetime_format is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for v in sample.iloc[:3]:
+                for dayfirst in (False, True):
+                    fmt = guess_datetime_format(v, dayfirst=dayfirst)
+                    if fmt and fmt not in cands: cands.append(fmt)
+    return cands + [f for f in DATETIME_FORMATS if f not in cands]
+
+def infer_datetime_format(sample):
+    if not len(sample) or not all(isinstance(v, str) for v in sample): return None
+    sample = sample.str.strip()
+    if not sample.str.contains(r"\d", regex=True).all(): return None
+    for fmt in _candidate_formats(sample):
+        if pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+def infer_datetime_column(s):
+    sample = sample_series(s)
+    if not len(sample): return None
+    if all(isinstance(v, (pd.Timestamp, np.datetime64)) or hasattr(v, "isoformat") for v in sample):
+        try: return pd.to_datetime(s)                     # Excel cells already holding datetimes
+        except (ValueError, TypeError): return None
+    fmt = infer_datetime_format(sample)
+    if fmt is None: return None
+    parsed, n_bad = parse_datetime(s, fmt)
+    return parsed if n_bad == 0 else None                     # same strictness as a raising to_datetime
+
+def parse_datetime(s, fmt):
+    # production exports repeat the same dates many times: parse each distinct value once
+    codes, uniques = pd.factorize(s)
+    parsed_u = pd.to_datetime(pd.Series(uniques, dtype="string").str.strip(), format=fmt, errors="coerce")
+    parsed = pd.Series(pd.DatetimeIndex(parsed_u).take(codes, allow_fill=True, fill_value=pd.NaT), index=s.index, name=s.name)
+    return parsed, int(parsed_u.isna().sum())
+
+def coerce_datetime_columns(df):
+    for col in df.columns:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+            parsed = infer_datetime_column(df[col])
+            if parsed is not None: df[col] = parsed
+    return df
+
+SHEET_COL = "_sheet"
+
+def parse_file(data, options):
+    # every non-empty sheet of a workbook; dates are coerced per sheet, then sheets are stacked
+    # (columns aligned by name) with a _sheet column when more than one sheet holds data
+    buf = io.BytesIO(data)
+    with span("ingest.read", kind=options["kind"], bytes=len(data)) as sp:
+        if options["kind"] == "excel":
+            sheets = {name: df for name, df in pd.read_excel(buf, sheet_name=None).items() if not df.empty}
+        else:
+            sheets = {None: pd.read_csv(buf, sep=options["sep"])}
+        sp["rows"] = sum(len(df) for df in sheets.values())
+        sp["sheets"] = len(sheets)
+    if not sheets: return pd.DataFrame()
+    with span("ingest.coerce_dates", rows=sp.get("rows")):
+        frames = [coerce_datetime_columns(df) for df in sheets.values()]
+    if len(frames) == 1: return frames[0]
+    out = pd.concat(frames, ignore_index=True, sort=False)
+    out[SHEET_COL] = label_rows([str(n) for n in sheets], [len(f) for f in frames])
+    return out
+
+def label_rows(labels, lengths):
+    # one categorical label per block of rows, without materializing an object array
+    cats = list(dict.fromkeys(labels))
+    codes = np.repeat(np.array([cats.index(l) for l in labels], dtype=np.int32), lengths)
+    return pd.Categorical.from_codes(codes, categories=cats)
+
+# ===================================================================
+# COMPACT IN-MEMORY REPRESENTATION
+# ===================================================================
+# Run once per loaded dataset. Repetitive text columns (line, shift, defect
+# type, source file) become categoricals; integer columns, and float columns
+# that hold only whole numbers, are downcast to the smallest integer type.
+# Fractional floats stay float64: float32 would change decimal readings and
+# accumulate sums in single precision. A per-column report is kept in
+# df.attrs["qa_memory"].
+CATEGORY_MAX_RATIO = 0.5
+
+def _compact_series(s, max_ratio):
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        sample = sample_series(s)
+        if len(sample) and sample.nunique() > max_ratio * len(sample): return s
+        return s.astype("category") if s.nunique() <= max_ratio * max(len(s), 1) else s
+    if pd.api.types.is_bool_dtype(s.dtype) or not pd.api.types.is_numeric_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return pd.to_numeric(s, downcast="integer") if isinstance(s.dtype, np.dtype) else s
+    v = s.to_numpy()
+    if isinstance(s.dtype, np.dtype) and len(v) and np.isfinite(v).all() and (np.mod(v, 1) == 0).all() and np.abs(v).max() < 2**53:
+        return pd.to_numeric(s.astype(np.int64), downcast="integer")
+    return s
+
+def compact_frame(df, max_ratio=CATEGORY_MAX_RATIO):
+    with span("ingest.compact", rows=len(df)):
+        return _compact_frame(df, max_ratio)
+
+def _compact_frame(df, max_ratio):
+    report, cols = [], {}
+    for c in df.columns:
+        s = df[c]; new = _compact_series(s, max_ratio)
+        cols[c] = new
+        report.append({"kolom": str(c), "dtype_awal": str(s.dtype), "dtype": str(new.dtype),
+                       "bytes_awal": int(s.memory_usage(index=False, deep=True)),
+                       "bytes": int(new.memory_usage(index=False, deep=True)) if new is not s else None})
+    for r in report:
+        if r["bytes"] is None: r["bytes"] = r["bytes_awal"]
+    out = pd.DataFrame(cols, index=df.index, copy=False)
+    out.attrs = {**df.attrs, "qa_memory": report}
+    return out
+
+def memory_report(df):
+    rep = pd.DataFrame(df.attrs.get("qa_memory", []))
+    if rep.empty: return rep
+    rep["hemat_%"] = (1 - rep["bytes"] / rep["bytes_awal"].where(rep["bytes_awal"] > 0)).fillna(0).mul(100).round(1)
+    rep["MB_awal"], rep["MB"] = (rep["bytes_awal"] / 1024**2).round(2), (rep["bytes"] / 1024**2).round(2)
+    return rep[["kolom", "dtype_awal", "dtype", "MB_awal", "MB", "hemat_%"]].sort_values("MB_awal", ascending=False, ignore_index=True)
+
+# ===================================================================
+# PARALLEL MULTI-FILE INGESTION
+# ===================================================================
+# Cache misses are parsed in a process pool (read_excel is CPU-bound and holds
+# the GIL), one task per file. Each result is cached as its task completes,
+# before the progress callback runs, so a rerun that interrupts the upload
+# (raising out of the callback) keeps every file parsed so far and cancels the
+# tasks not yet started. A file that fails to parse is reported in
+# df.attrs["qa_failed"] instead of aborting the whole upload. Small CSV-only
+# batches stay in-process, where pool start-up and pickling would cost more
+# than they save.
+INGEST_WORKERS = int(os.environ.get("QA_INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+PARALLEL_MIN_FILES = 2
+PARALLEL_MIN_BYTES = 8 * 1024**2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_ingest_pool():
+    # spawn, not fork: the Streamlit server is multi-threaded
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def use_pool(jobs):
+    if INGEST_WORKERS < 2 or len(jobs) < PARALLEL_MIN_FILES: return False
+    return any(o["kind"] == "excel" for _, o in jobs) or sum(len(d) for d, _ in jobs) >= PARALLEL_MIN_BYTES
+
+def parse_many(jobs, progress=None, parsed=None):
+    # jobs: [(data, options)] -> [(frame | None, error | None)] in job order
+    # parsed(i, frame) runs as each job succeeds, before progress(done, total, i)
+    results = [None] * len(jobs)
+    done = 0
+    def finish(i, df=None, err=None):
+        nonlocal done
+        results[i] = (df, err); done += 1
+        if parsed and err is None: parsed(i, df)
+        if progress: progress(done, len(jobs), i)
+    if use_pool(jobs):
+        try:
+            pool = get_ingest_pool()
+            futures = {pool.submit(parse_file, d, o): i for i, (d, o) in enumerate(jobs)}
+            try:
+                for fut in as_completed(futures):
+                    try: df = fut.result()
+                    except BrokenProcessPool: raise
+                    except Exception as e: finish(futures[fut], err=f"{type(e).__name__}: {e}"); continue
+                    finish(futures[fut], df)
+            except BaseException:
+                for fut in futures: fut.cancel()          # e.g. a rerun raised in progress: do not leave queued parses behind
+                raise
+            return results
+        except BrokenProcessPool:
+            _reset_pool()                              # a worker died (e.g. OOM); finish the rest in-process
+    for i, (d, o) in enumerate(jobs):
+        if results[i] is not None: continue
+        try: df = parse_file(d, o)
+        except Exception as e: finish(i, err=f"{type(e).__name__}: {e}"); continue
+        finish(i, df)
+    return results
+
+def load_uploads(files, cache=None, progress=None, registry=None):
+    # The combined frame lives once per process in the dataset registry; every caller gets
+    # a shallow copy-on-write copy of it. Parsed frames also go to the parse cache's disk
+    # tier (not its memory tier, which would hold a second copy).
+    # progress(done, total, name) is called as each file finishes parsing.
+    cache, registry = cache or get_parse_cache(), registry or get_dataset_registry()
+    datas, opts, keys, names = [], [], [], []
+    for file in files:
+        datas.append(file.getvalue()); opts.append(reader_options(file.name)); names.append(file.name)
+        keys.append(content_key(datas[-1], version=PARSER_VERSION, **opts[-1]))
+    src_key = content_key("\n".join(f"{k}|{n}" for k, n in zip(keys, names)).encode())
+    df_raw = registry.get(src_key)
+    if df_raw is None:
+        df_raw = cache.get(src_key, memory=False)
+        if df_raw is None:
+            frames = [cache.get(k, memory=False) for k in keys]
+            miss = [i for i, f in enumerate(frames) if f is None]
+            failed = []
+            if miss:
+                cache.stats["miss"] += len(miss)
+                with span("ingest.files", files=len(miss), workers=INGEST_WORKERS if use_pool([(datas[i], opts[i]) for i in miss]) else 1):
+                    report = (lambda done, total, j: progress(done, total, names[miss[j]])) if progress else None
+                    parsed = parse_many([(datas[i], opts[i]) for i in miss], report, lambda j, df: cache.put(keys[miss[j]], df, memory=False))
+                for i, (df, err) in zip(miss, parsed):
+                    if err is None: frames[i] = df
+                    else: failed.append({"file": names[i], "error": err})
+            ok = [i for i, f in enumerate(frames) if f is not None]
+            if not ok: raise ValueError("; ".join(f"{f['file']}: {f['error']}" for f in failed))
+            with span("ingest.concat", files=len(ok)):
+                df_raw = pd.concat([frames[i] for i in ok], ignore_index=True, sort=False) if len(ok) > 1 else frames[ok[0]].copy(deep=False)
+                df_raw["_source_file"] = label_rows([names[i] for i in ok], [len(frames[i]) for i in ok])
+            df_raw = compact_frame(df_raw)
+            df_raw.attrs["qa_failed"] = failed               # cached too: the same bytes would fail again
+            cache.put(src_key, df_raw, memory=False)
+        df_raw = registry.put(src_key, df_raw)
+    df_raw.attrs["qa_source_key"] = src_key
+    return df_raw
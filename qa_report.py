@@ -0,0 +1,218 @@
+import argparse
+import functools
+import html
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from qa_detect import apply_profile, auto_detect_all_columns, get_mapping_profiles, resolve_mapping, schema_fingerprint
+from qa_ingest import load_uploads
+from qa_rollup import RollupCube
+from qa_spc import compute_imr_chart, compute_p_chart
+
+# ===================================================================
+# HEADLESS BATCH REPORT (one offline HTML file per stratum)
+# ===================================================================
+# Usage:
+#   python qa_report.py data/*.xlsx --by Line --out laporan/
+#   python qa_report.py data.csv --by Line,Produk --workers 8 --measure diameter,berat
+# The files are loaded once through the same parse cache / registry as the app
+# and the column mapping comes from a saved profile or auto-detection (each
+# role can be overridden). Every stratum of --by gets its p-chart, Pareto and
+# I-MR charts, built by the same qa_spc / qa_charts code the dashboard uses.
+# Reports are self-contained: plotly.js is inlined once per file and every
+# figure is a plain Plotly.newPlot call on it, so they open offline and can be
+# mailed as-is. Strata are rendered in a spawn process pool, one task per
+# stratum carrying only the columns the report needs; each worker writes its
+# own file. index.html links every report with its headline numbers.
+
+REPORT_WORKERS = int(os.environ.get("QA_REPORT_WORKERS", "0")) or (os.cpu_count() or 1)
+PARALLEL_MIN_STRATA = 4
+MAX_IMR_CHARTS = 3                    # like Auto-Recommend in the dashboard
+
+class LocalFile:
+    # the slice of Streamlit's UploadedFile that load_uploads uses
+    def __init__(self, path):
+        self.path, self.name = path, os.path.basename(path)
+
+    def getvalue(self):
+        with open(self.path, "rb") as f: return f.read()
+
+def load_mapping(df, overrides=None):
+    fp = df.attrs.get("qa_schema") or schema_fingerprint(df)
+    profile = get_mapping_profiles().get(fp)
+    mapping = apply_profile(df, profile)[1] if profile else resolve_mapping(df, auto_detect_all_columns(df))
+    for role, col in (overrides or {}).items():
+        if col is None: continue
+        if role == "measurement": mapping[role] = [c for c in col if c in df.columns]
+        elif col in df.columns: mapping[role] = col
+        else: raise ValueError(f"kolom '{col}' untuk {role} tidak ada di data")
+    return mapping
+
+def stratum_label(by, key):
+    key = key if isinstance(key, tuple) else (key,)
+    return ", ".join(f"{c}={v}" for c, v in zip(by, key))
+
+UNSAFE_NAME = re.compile(r"[^\w.-]+")
+
+def report_name(i, label):
+    return f"{i:03d}_{UNSAFE_NAME.sub('_', label).strip('_')[:80]}.html"
+
+def split_strata(df, by, mapping):
+    # -> [(label, sub-frame)] with only the mapped columns, in stratum order
+    cols = [c for c in dict.fromkeys([mapping["date"], mapping["sample_size"], mapping["defect_count"], mapping["defect_type"], *mapping["measurement"]]) if c]
+    if not by: return [("Semua data", df[cols])]
+    groups = df.groupby(by if len(by) > 1 else by[0], observed=True, sort=True).indices
+    return [(stratum_label(by, k), df[cols].iloc[idx]) for k, idx in groups.items()]
+
+# -- rendering (runs in the worker) --
+@functools.lru_cache(maxsize=None)
+def plotly_js():
+    from plotly.offline import get_plotlyjs
+    return get_plotlyjs()
+
+def _figure_div(fig):
+    import plotly.io as pio
+    return pio.to_html(fig, full_html=False, include_plotlyjs=False, config={"displaylogo": False, "responsive": True}, validate=False)
+
+def _violations(cs):
+    from qa_charts import RULE_SHORT
+    hits = [f"{RULE_SHORT[r]} — {len(i)} titik" for r, i in cs.violations.items() if len(i)]
+    return ('<p class="viol">⚠️ ' + " • ".join(hits) + "</p>") if hits else '<p class="ok">✅ In-Control — tidak ada pelanggaran.</p>'
+
+def stratum_sections(df, mapping, max_imr=MAX_IMR_CHARTS):
+    # -> (html sections, summary row); figure builders are called unwrapped: a worker draws each figure once
+    from qa_charts import build_two_panel_chart, build_varying_limit_chart, render_pareto_chart
+    d_col, n_col, ng_col, dt_col = mapping["date"], mapping["sample_size"], mapping["defect_count"], mapping["defect_type"]
+    cube = RollupCube(df, d_col, [c for c in (n_col, ng_col) if c], (), [dt_col] if dt_col else [])
+    out, summary = [], {"rows": len(df), "violations": 0}
+    if n_col and ng_col:
+        tot = cube.table()
+        summary["n"], summary["ng"] = float(tot[n_col].iloc[0]), float(tot[ng_col].iloc[0])
+        summary["defect_rate"] = summary["ng"] / summary["n"] * 100 if summary["n"] > 0 else float("nan")
+        if d_col:
+            res = compute_p_chart(cube.table("day"), d_col, n_col, ng_col)
+            if res.ok:
+                fig, _ = build_varying_limit_chart.__wrapped__(res, "p-Chart (Proportion Defective)", "Proporsi Defect", "p̄", height=420, rule_traces=True)
+                cs = res.series[0]
+                summary["p_bar"] = res.stats["p_bar"]; summary["violations"] += sum(len(i) for i in cs.violations.values())
+                out.append(("p-Chart", _figure_div(fig) + _violations(cs)))
+            else: out.append(("p-Chart", f'<p class="viol">{html.escape(res.message)}</p>'))
+    if dt_col and ng_col:
+        pareto = cube.table(None, [dt_col])[[dt_col, ng_col]].sort_values(ng_col, ascending=False, ignore_index=True)
+        if len(pareto): out.append(("Pareto", _figure_div(render_pareto_chart.__wrapped__(pareto, dt_col, ng_col))))
+    if d_col:
+        for m_col in mapping["measurement"][:max_imr]:
+            res = compute_imr_chart(df, m_col, d_col)
+            if not res.ok: continue
+            fig, _ = build_two_panel_chart.__wrapped__(res, ["I Chart (Individual)", "MR Chart (Moving Range)"], f"I-MR Chart — {m_col}")
+            summary["violations"] += sum(len(i) for cs in res.series for i in cs.violations.values())
+            out.append((f"I-MR — {m_col}", _figure_div(fig) + "".join(_violations(cs) for cs in res.series)))
+    if d_col and len(df):
+        dates = pd.to_datetime(df[d_col], errors="coerce")
+        summary["period"] = f"{dates.min():%Y-%m-%d} s/d {dates.max():%Y-%m-%d}" if dates.notna().any() else ""
+    return out, summary
+
+_CSS = """
+body { font-family: Arial, sans-serif; background:#f4f6f9; color:#222; margin:24px; }
+h1 { color:#1e3d59; margin-bottom:4px; } h2 { color:#1e3d59; border-bottom:2px solid #dde3ed; padding-bottom:4px; }
+.meta { color:#666; font-size:.9em; } .card { background:#fff; border:1px solid #dde3ed; border-radius:8px; padding:14px; margin:14px 0; }
+.ok { background:#e8f5e9; border-left:4px solid #4caf50; padding:6px 10px; } .viol { background:#fdecea; border-left:4px solid #f44336; padding:6px 10px; }
+table { border-collapse:collapse; background:#fff; } th, td { border:1px solid #dde3ed; padding:4px 10px; text-align:right; } th:first-child, td:first-child { text-align:left; }
+"""
+
+def _summary_line(s):
+    parts = [f"{s['rows']:,} baris"]
+    if s.get("period"): parts.append(s["period"])
+    if "n" in s: parts += [f"inspeksi {s['n']:,.0f}", f"NG {s['ng']:,.0f}", f"defect rate {s['defect_rate']:.2f}%"]
+    return " • ".join(parts)
+
+def render_stratum(label, df, mapping, path, source=""):
+    t0 = time.perf_counter()
+    sections, summary = stratum_sections(df, mapping)
+    body = "".join(f'<div class="card"><h2>{html.escape(t)}</h2>{div}</div>' for t, div in sections) or '<p class="viol">Tidak ada chart untuk stratum ini (kolom tanggal / qty / NG tidak terpetakan).</p>'
+    page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>QA Report — {html.escape(label)}</title>'
+            f'<script type="text/javascript">{plotly_js()}</script><style>{_CSS}</style></head><body>'
+            f'<h1>🏭 QA Report — {html.escape(label)}</h1><p class="meta">{html.escape(_summary_line(summary))}<br>{html.escape(source)} • dibuat {time.strftime("%Y-%m-%d %H:%M")}</p>'
+            f'{body}</body></html>')
+    with open(path, "w", encoding="utf-8") as f: f.write(page)
+    return {**summary, "label": label, "file": os.path.basename(path), "charts": len(sections), "s": time.perf_counter() - t0}
+
+def _render_task(label, df, mapping, path, source):
+    try: return render_stratum(label, df, mapping, path, source)
+    except Exception as e: return {"label": label, "file": os.path.basename(path), "rows": len(df), "error": f"{type(e).__name__}: {e}"}
+
+def render_index(results, path, title):
+    rows = []
+    for r in results:
+        name = f'<a href="{html.escape(r["file"])}">{html.escape(r["label"])}</a>' if "error" not in r else html.escape(r["label"])
+        cells = [f"{r['rows']:,}", f"{r['n']:,.0f}" if "n" in r else "", f"{r['ng']:,.0f}" if "ng" in r else "",
+                 f"{r['defect_rate']:.2f}%" if "defect_rate" in r else "", f"{r['p_bar']:.4f}" if "p_bar" in r else "",
+                 str(r.get("violations", "")) if "error" not in r else f'<span class="viol">{html.escape(r["error"])}</span>']
+        rows.append(f"<tr><td>{name}</td>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    head = "".join(f"<th>{h}</th>" for h in ["Stratum", "Baris", "Inspeksi", "NG", "Defect rate", "p̄", "Pelanggaran"])
+    page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title><style>{_CSS}</style></head><body>'
+            f'<h1>{html.escape(title)}</h1><p class="meta">{len(results)} stratum • dibuat {time.strftime("%Y-%m-%d %H:%M")}</p>'
+            f'<table><tr>{head}</tr>{"".join(rows)}</table></body></html>')
+    with open(path, "w", encoding="utf-8") as f: f.write(page)
+
+# -- batch --
+def run_batch(paths, by=(), out_dir="qa_reports", workers=REPORT_WORKERS, overrides=None, progress=None):
+    # progress(done, total, result) as each stratum report is written; returns one result dict per stratum
+    df = load_uploads([LocalFile(p) for p in paths])
+    for f in df.attrs.get("qa_failed", []): print(f"⚠️ {f['file']} dilewati: {f['error']}", file=sys.stderr)
+    by = list(by)
+    missing = [c for c in by if c not in df.columns]
+    if missing: raise ValueError(f"kolom stratifikasi tidak ada di data: {', '.join(missing)}")
+    mapping = load_mapping(df, overrides)
+    strata = split_strata(df, by, mapping)
+    os.makedirs(out_dir, exist_ok=True)
+    source = ", ".join(os.path.basename(p) for p in paths)
+    jobs = [(label, sub, mapping, os.path.join(out_dir, report_name(i, label)), source) for i, (label, sub) in enumerate(strata, 1)]
+    results = [None] * len(jobs)
+    done = 0
+    def finish(i, r):
+        nonlocal done
+        results[i] = r; done += 1
+        if progress: progress(done, len(jobs), r)
+    workers = min(workers, len(jobs))
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_STRATA:
+        # spawn, like the ingest pool: no forked copy of the loaded frame or of plotly's state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render_task, *job): i for i, job in enumerate(jobs)}
+            for fut in as_completed(futures): finish(futures[fut], fut.result())
+    else:
+        for i, job in enumerate(jobs): finish(i, _render_task(*job))
+    render_index(results, os.path.join(out_dir, "index.html"), f"QA Report — {', '.join(by) or 'Semua data'} • {source}")
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description="Laporan QA per stratum (HTML offline) tanpa dashboard.")
+    ap.add_argument("files", nargs="+", help="xlsx / xls / csv / tsv")
+    ap.add_argument("--by", default="", help="kolom stratifikasi, pisahkan dengan koma (mis. Line atau Line,Produk)")
+    ap.add_argument("--out", default="qa_reports")
+    ap.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    for role, flag in (("date", "--date"), ("sample_size", "--qty"), ("defect_count", "--ng"), ("defect_type", "--defect-type")):
+        ap.add_argument(flag, dest=role, default=None, help=f"kolom {role} (default: profil tersimpan / auto-detect)")
+    ap.add_argument("--measure", default=None, help="kolom pengukuran untuk I-MR, pisahkan dengan koma")
+    args = ap.parse_args()
+
+    overrides = {r: getattr(args, r) for r in ("date", "sample_size", "defect_count", "defect_type")}
+    if args.measure is not None: overrides["measurement"] = [c.strip() for c in args.measure.split(",") if c.strip()]
+    by = [c.strip() for c in args.by.split(",") if c.strip()]
+    t0 = time.perf_counter()
+    def report(done, total, r):
+        print(f"[{done}/{total}] {r['label']}: " + (f"GAGAL — {r['error']}" if "error" in r else f"{r['charts']} chart • {r['s']:.2f} s → {r['file']}"), flush=True)
+    try: results = run_batch(args.files, by, args.out, args.workers, overrides, report)
+    except ValueError as e: ap.error(str(e))
+    failed = sum("error" in r for r in results)
+    print(f"\n{len(results) - failed}/{len(results)} laporan dalam {time.perf_counter() - t0:.1f} s • {os.path.join(args.out, 'index.html')}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
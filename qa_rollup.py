@@ -0,0 +1,201 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# ROLLUP CUBE (period × strata sums, built once per filtered view)
+# ===================================================================
+# One groupby over the filtered rows gives, per (day, *strata) cell: the sums of
+# the count columns (qty check, qty NG), the row count, and for each
+# measurement column n, Σx and Σx². Week/month grains and any subset of strata
+# are re-aggregations of that small base table, so pareto, heatmap, sunburst,
+# the attribute control charts and the weekly trend never touch the raw rows.
+# Tables keep the original column names (period in the date column), so they
+# can be passed to the same groupby-based code as the raw frame.
+
+GRAINS = ("day", "week", "month")
+WEEK_ANCHOR = 5                   # 1970-01-06 (Tuesday): weeks ending Monday, like to_period("W-MON")
+COUNT = "_count"
+MAX_CACHED_CUBES = 8
+
+def floor_period(s, grain):
+    d = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+    if getattr(d.dt, "tz", None) is not None: d = d.dt.tz_localize(None)
+    days = d.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    if grain == "month": out = days.astype("datetime64[M]").astype("datetime64[D]")
+    elif grain == "week":
+        i = days.astype(np.int64)
+        out = np.where(np.isnat(days), np.datetime64("NaT", "D"), ((i - WEEK_ANCHOR) // 7 * 7 + WEEK_ANCHOR).astype("datetime64[D]"))
+    elif grain == "day": out = days
+    else: raise ValueError(f"unknown grain: {grain}")
+    return out.astype("datetime64[ns]")
+
+def moment_cols(m):
+    return f"{m}:n", f"{m}:sum", f"{m}:sumsq"
+
+class RollupCube:
+    def __init__(self, df, date_col=None, sum_cols=(), meas_cols=(), strata=()):
+        self.date_col  = date_col if date_col in df.columns else None
+        self.sum_cols  = [c for c in dict.fromkeys(sum_cols) if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+        self.meas_cols = [c for c in dict.fromkeys(meas_cols) if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+        self.strata    = [c for c in dict.fromkeys(strata) if c in df.columns and c != self.date_col]
+        self.rows      = len(df)
+
+        # sums in int64/float64: compacted int8/int16 columns would overflow in a groupby sum
+        cols = {c: df[c].to_numpy(dtype=float if pd.api.types.is_float_dtype(df[c]) else np.int64, na_value=0) for c in self.sum_cols}
+        cols[COUNT] = np.ones(len(df), dtype=np.int64)
+        self.shift = {}
+        for m in self.meas_cols:
+            # moments about the column mean, so Σx² does not cancel catastrophically for large offsets
+            x = df[m].to_numpy(dtype=float, na_value=np.nan)
+            ok = ~np.isnan(x)
+            self.shift[m] = float(x[ok].mean()) if ok.any() else 0.0
+            x = np.where(ok, x - self.shift[m], 0.0)
+            n_c, s_c, q_c = moment_cols(m)
+            cols[n_c], cols[s_c], cols[q_c] = ok.astype(np.int64), x, x * x
+        keys = {self.date_col: floor_period(df[self.date_col], "day")} if self.date_col else {}
+        for c in self.strata: keys[c] = df[c].array
+        base = pd.DataFrame({**keys, **cols}, copy=False)
+        self.keys = list(keys)
+        # base keeps NaT dates and missing strata; table() drops them per query, like a groupby on the raw rows
+        self.base = base.groupby(self.keys, observed=True, dropna=False, sort=True).sum().reset_index() if self.keys else base.sum().to_frame().T
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def covers(self, date_col=None, cols=(), by=()):
+        known = set(self.sum_cols) | {COUNT}
+        return (date_col is None or date_col == self.date_col) and set(cols) <= known and set(by) <= set(self.strata)
+
+    def table(self, grain=None, by=()):
+        # one row per (period, *by) with the summed columns; grain=None aggregates over all dates
+        by = list(by)
+        key = (grain, tuple(by))
+        with self._lock:
+            t = self._tables.get(key)
+        if t is not None: return t
+        if grain is not None and not self.date_col: raise ValueError("cube has no date column")
+        base = self.base
+        keys = by
+        if grain is not None:
+            keys = [self.date_col] + by
+            if grain != "day":
+                base = base.assign(**{self.date_col: floor_period(base[self.date_col], grain)})
+        vals = [c for c in base.columns if c not in self.keys]
+        if keys: t = base.groupby(keys, observed=True, sort=True)[vals].sum().reset_index()
+        else:    t = base[vals].sum().to_frame().T
+        with self._lock:
+            self._tables[key] = t
+        return t
+
+    def memo(self, key, build):
+        # cache for tables derived from this cube (drill-down hierarchies, capped pivots)
+        with self._lock:
+            t = self._tables.get(key)
+        if t is None:
+            t = build()
+            with self._lock:
+                self._tables[key] = t
+        return t
+
+    def moments(self, grain=None, by=(), meas_col=None):
+        # count, mean and sample std of a measurement per (period, *by), from n, Σx, Σx²
+        t = self.table(grain, by)
+        n_c, s_c, q_c = moment_cols(meas_col)
+        n = t[n_c].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            d = t[s_c].to_numpy() / n
+            var = np.maximum(t[q_c].to_numpy() - n * d * d, 0) / (n - 1)
+        out = t[[c for c in t.columns if c in self.keys]].copy()
+        out["n"], out[meas_col], out["std"] = n.astype(np.int64), d + self.shift[meas_col], np.sqrt(np.where(n > 1, var, np.nan))
+        return out[out["n"] > 0].reset_index(drop=True)
+
+# ===================================================================
+# DRILL-DOWN HIERARCHY (capped sunburst nodes / heatmap cells)
+# ===================================================================
+# The sunburst and heatmap get pre-summed nodes, not rows. Per parent only the
+# MAX_CHILDREN largest children are kept; the rest are merged into one
+# "Lainnya (k)" leaf, so a part-number layer with thousands of values still
+# yields a few hundred nodes. Deeper layers keep fewer children per parent to
+# stay within MAX_NODES and are cut when not even one per parent fits.
+# Results are memoised on the cube, i.e. per filter state and path.
+
+MAX_CHILDREN = 12
+MAX_NODES = 500
+MAX_HEATMAP_LEVELS = 25
+OTHER = "Lainnya"
+ID_SEP, OTHER_SEP = "\x1f", "\x1e"      # node ids join labels with control characters, so "/" in a label cannot collide
+
+def _other_label(k):
+    return f"{OTHER} ({k})"
+
+def build_hierarchy(t, path, value_col, max_children=MAX_CHILDREN, max_nodes=MAX_NODES):
+    # t: one row per distinct path with summed value_col -> ids/labels/parents/values for go.Sunburst(branchvalues="total")
+    w = pd.DataFrame({"pid": "", "value": t[value_col].to_numpy(dtype=float)})
+    for c in path: w[c] = t[c].astype(str).to_numpy()
+    w = w[w["value"] > 0]
+    nodes, depth, used = [], 0, 0
+    for c in path:
+        agg = w.groupby(["pid", c], sort=False)["value"].sum().reset_index()
+        agg = agg.sort_values(["pid", "value"], ascending=[True, False], kind="stable")
+        # children per parent shrink to fit the remaining node budget (+1 for each parent's bucket)
+        k = min(max_children, (max_nodes - used) // max(1, agg["pid"].nunique()) - 1)
+        if k < 1: break
+        rank = agg.groupby("pid", sort=False).cumcount()
+        kept, rest = agg[rank < k], agg[rank >= k]
+        level = pd.DataFrame({"id": kept["pid"] + ID_SEP + kept[c], "label": kept[c], "parent": kept["pid"], "value": kept["value"]})
+        if len(rest):
+            other = rest.groupby("pid", sort=False)["value"].agg(["sum", "size"]).reset_index()
+            level = pd.concat([level, pd.DataFrame({"id": other["pid"] + OTHER_SEP + OTHER, "label": other["size"].map(_other_label),
+                                                    "parent": other["pid"], "value": other["sum"]})], ignore_index=True)
+        nodes.append(level); depth += 1; used += len(level)
+        # rows under a kept node descend; rows merged into the bucket stop here
+        w = w.merge(kept[["pid", c]], on=["pid", c])
+        w["pid"] = w["pid"] + ID_SEP + w[c]
+    out = pd.concat(nodes, ignore_index=True) if nodes else pd.DataFrame(columns=["id", "label", "parent", "value"])
+    out.attrs["depth"] = depth
+    return out
+
+def hierarchy(cube, path, value_col, max_children=MAX_CHILDREN, max_nodes=MAX_NODES):
+    path = list(path)
+    return cube.memo(("hierarchy", tuple(path), value_col, max_children, max_nodes),
+                     lambda: build_hierarchy(cube.table(None, path), path, value_col, max_children, max_nodes))
+
+def _cap_levels(s, weights, k):
+    # string labels in sorted order (like pivot()), all but the k largest totals merged into a trailing bucket
+    tot = weights.groupby(s, observed=True).sum()
+    top = set(tot.nlargest(k).index)
+    labels = [str(v) for v in tot.index if v in top]
+    s = s.astype(str)
+    if len(tot) > k:
+        labels.append(_other_label(len(tot) - k))
+        s = s.where(s.isin(labels[:-1]), labels[-1])
+    return s, labels
+
+def capped_pivot(cube, row_col, col_col, value_col, max_levels=MAX_HEATMAP_LEVELS):
+    # row × column sums with at most max_levels (+ bucket) labels per axis
+    def build():
+        t = cube.table(None, [row_col, col_col])
+        r, r_labels = _cap_levels(t[row_col], t[value_col], max_levels)
+        c, c_labels = _cap_levels(t[col_col], t[value_col], max_levels)
+        hm = t[value_col].groupby([r.rename(row_col), c.rename(col_col)]).sum().unstack(fill_value=0)
+        return hm.reindex(index=r_labels, columns=c_labels, fill_value=0)
+    return cube.memo(("pivot", row_col, col_col, value_col, max_levels), build)
+
+_cubes = OrderedDict()
+_cubes_lock = threading.Lock()
+
+def get_rollup(df, view_key=None, date_col=None, sum_cols=(), meas_cols=(), strata=()):
+    # view_key identifies the filtered rows (dataset content key + filter selections)
+    if view_key is None: return RollupCube(df, date_col, sum_cols, meas_cols, strata)
+    key = (view_key, len(df), date_col, tuple(sum_cols), tuple(meas_cols), tuple(strata))
+    with _cubes_lock:
+        cube = _cubes.get(key)
+        if cube is not None:
+            _cubes.move_to_end(key); return cube
+    cube = RollupCube(df, date_col, sum_cols, meas_cols, strata)
+    with _cubes_lock:
+        _cubes[key] = cube
+        while len(_cubes) > MAX_CACHED_CUBES: _cubes.popitem(last=False)
+    return cube
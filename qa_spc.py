@@ -0,0 +1,393 @@
+import math
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# NELSON / WESTERN ELECTRIC RULE ENGINE (vectorized)
+# ===================================================================
+# Every rule is O(n): run lengths come from a running "last break" index and
+# k-of-m counts from a cumulative-sum window, so no per-point slicing happens.
+# Indices reported for a rule are the last point of each offending window.
+# ucl/lcl/cl may be scalars or per-point arrays (p/u charts). With `groups`
+# (contiguous group codes), several series are checked in one pass and no run
+# or window crosses a group boundary.
+
+NELSON_PARAMS = {
+    2: {"run": 8},                  # n titik berturut-turut di satu sisi CL
+    3: {"run": 6},                  # n titik naik/turun berturut-turut
+    4: {"run": 14},                 # n titik berselang-seling naik-turun
+    5: {"k": 2, "m": 3, "z": 2.0},  # k dari m titik di luar 2σ (sisi sama)
+    6: {"k": 4, "m": 5, "z": 1.0},  # k dari m titik di luar 1σ (sisi sama)
+    7: {"run": 15},                 # n titik berturut-turut di dalam 1σ
+    8: {"run": 8},                  # n titik berturut-turut di luar 1σ (kedua sisi)
+}
+ALL_RULES = (1, 2, 3, 4, 5, 6, 7, 8)
+
+def run_length(mask, start=None):
+    # length of the run of True values ending at each position (reset at `start` positions)
+    idx = np.arange(len(mask))
+    breaks = np.where(mask, -1, idx)
+    if start is not None: breaks = np.where(mask & start, idx - 1, breaks)
+    return idx - np.maximum.accumulate(breaks)
+
+def group_starts(groups):
+    groups = np.asarray(groups)
+    start = np.ones(len(groups), dtype=bool)
+    start[1:] = groups[1:] != groups[:-1]
+    return start
+
+def window_count(mask, m):
+    # number of True values in the window of m points ending at each position (valid from m-1)
+    cs = np.cumsum(mask, dtype=np.int64)
+    out = cs.copy()
+    out[m:] -= cs[:-m]
+    out[:m-1] = 0
+    return out
+
+def _hits(mask, offset=0):
+    return (np.flatnonzero(mask) + offset).astype(np.int64)
+
+def detect_violations(values, ucl, lcl, cl, rules=ALL_RULES, params=None, groups=None):
+    x   = np.asarray(values, dtype=float)
+    ucl = np.broadcast_to(np.asarray(ucl, dtype=float), x.shape)
+    lcl = np.broadcast_to(np.asarray(lcl, dtype=float), x.shape)
+    cl  = np.broadcast_to(np.asarray(cl,  dtype=float), x.shape)
+    p   = {r: {**NELSON_PARAMS.get(r, {}), **((params or {}).get(r, {}))} for r in rules}
+    empty = np.empty(0, dtype=np.int64)
+    violations = {r: empty for r in rules}
+    if len(x) == 0: return violations
+
+    sigma = (ucl - cl) / 3
+    sigma = np.where(sigma != 0, sigma, 1e-9)
+    z = (x - cl) / sigma
+    d = np.diff(x)
+    start = pos = None
+    if groups is not None:
+        start = group_starts(groups)
+        d[start[1:]] = np.nan                              # no differences across groups
+        idx = np.arange(len(x))
+        pos = idx - np.maximum.accumulate(np.where(start, idx, 0))
+
+    if 1 in rules:
+        violations[1] = _hits((x > ucl) | (x < lcl))
+    if 2 in rules:
+        k = p[2]["run"]
+        violations[2] = _hits((run_length(x > cl, start) >= k) | (run_length(x < cl, start) >= k))
+    if 3 in rules and len(d):
+        k = p[3]["run"] - 1
+        violations[3] = _hits((run_length(d > 0) >= k) | (run_length(d < 0) >= k), offset=1)
+    if 4 in rules and len(d) > 1:
+        k = p[4]["run"] - 2
+        violations[4] = _hits(run_length(d[1:] * d[:-1] < 0) >= k, offset=2)
+    for r in (5, 6):
+        if r in rules:
+            k, m, zl = p[r]["k"], p[r]["m"], p[r]["z"]
+            if len(x) >= m:
+                hit = (window_count(z > zl, m) >= k) | (window_count(z < -zl, m) >= k)
+                if pos is not None: hit &= pos >= m - 1
+                violations[r] = _hits(hit)
+    if 7 in rules:
+        violations[7] = _hits(run_length(np.abs(z) < 1, start) >= p[7]["run"])
+    if 8 in rules:
+        violations[8] = _hits(run_length(np.abs(z) > 1, start) >= p[8]["run"])
+    return violations
+
+# ===================================================================
+# SPC CONSTANTS
+# ===================================================================
+# Computed for any subgroup size instead of read from a table that stops at
+# n=10: d2 = E[range] and d3 = sd[range] of n standard normals by numerical
+# integration (cached per n, matching the published tables to 3 decimals), c4
+# from the gamma function. A2/D3/D4/A3/B3/B4 follow from them.
+
+_GRID = np.linspace(-8, 8, 641)                 # h=0.025: d3 within 1e-4, ~10 ms per n
+_PHI = None
+
+def _phi_grid():
+    global _PHI
+    if _PHI is None: _PHI = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in _GRID])
+    return _PHI
+
+@lru_cache(maxsize=None)
+def range_constants(n):
+    # E[R] = ∫ 1 - Φⁿ - (1-Φ)ⁿ dx ;  E[R²] = 2 ∫∫_{x<y} 1 - Φ(y)ⁿ - (1-Φ(x))ⁿ + (Φ(y)-Φ(x))ⁿ dx dy
+    if n < 2: return 0.0, 0.0
+    P, h = _phi_grid(), _GRID[1] - _GRID[0]
+    d2 = float(np.trapezoid(1 - P**n - (1 - P)**n, _GRID))
+    f = np.triu(1 - P[None, :]**n - (1 - P[:, None])**n + np.clip(P[None, :] - P[:, None], 0, None)**n)
+    er2 = 2 * (f.sum() - 0.5 * np.trace(f)) * h * h
+    return d2, math.sqrt(max(er2 - d2 * d2, 0.0))
+
+def c4(n):
+    # E[s]/σ for subgroup size n; evaluated once per distinct size
+    u, inv = np.unique(np.asarray(n, dtype=np.int64), return_inverse=True)
+    cu = np.array([math.sqrt(2 / (k - 1)) * math.exp(math.lgamma(k / 2) - math.lgamma((k - 1) / 2)) if k > 1 else np.nan for k in u])
+    return cu[inv].reshape(np.shape(n))
+
+def range_constants_for(n):
+    # per-subgroup d2, d3 for an array of subgroup sizes (integrated once per distinct size)
+    u, inv = np.unique(np.asarray(n, dtype=np.int64), return_inverse=True)
+    rc = np.array([range_constants(int(k)) for k in u]).reshape(-1, 2)
+    return rc[inv, 0], rc[inv, 1]
+
+def get_spc(n):
+    n = int(n)
+    if n < 2: return (0,) * 7
+    d2, d3 = range_constants(n); c = float(c4(n))
+    A2, D3, D4 = 3 / (d2 * math.sqrt(n)), max(0.0, 1 - 3 * d3 / d2), 1 + 3 * d3 / d2
+    k = 3 * math.sqrt(1 - c * c) / c
+    A3, B3, B4 = 3 / (c * math.sqrt(n)), max(0.0, 1 - k), 1 + k
+    return A2,D3,D4,A3,B3,B4,d2
+
+# ===================================================================
+# HEADLESS CHART COMPUTATION
+# ===================================================================
+# Pure functions (no Streamlit, no Plotly) returning slot-based results that the
+# renderers in app_qa.py only draw. Array-level functions take x labels and
+# per-period arrays; the compute_* wrappers do the groupby from a DataFrame.
+# Limits are floats, or per-point arrays for p/u charts. Centre lines (p_bar,
+# c_bar, u_bar, x_bar/mr_bar) can be passed in, e.g. from the history store,
+# instead of being estimated from the data being plotted.
+
+@dataclass(slots=True)
+class ControlSeries:
+    name: str
+    x: np.ndarray
+    values: np.ndarray
+    cl: "float | np.ndarray"
+    ucl: "float | np.ndarray"
+    lcl: "float | np.ndarray"
+    violations: dict
+
+    @property
+    def n_violations(self):
+        return sum(len(v) for v in self.violations.values())
+
+@dataclass(slots=True)
+class ChartResult:
+    chart: str
+    series: tuple = ()
+    stats: dict = field(default_factory=dict)
+    message: "str | None" = None      # set when the chart cannot be computed (e.g. too few periods)
+
+    @property
+    def ok(self):
+        return self.message is None
+
+def p_chart(x, n, ng, rules=ALL_RULES, params=None, p_bar=None):
+    n = np.asarray(n, dtype=float); ng = np.asarray(ng, dtype=float); x = np.asarray(x)
+    keep = n > 0
+    x, n, ng = x[keep], n[keep], ng[keep]
+    if len(n) < 3: return ChartResult("p", message="Minimal 3 periode.")
+    p = ng / n
+    p_bar = ng.sum() / n.sum() if p_bar is None else p_bar
+    se  = np.sqrt(p_bar*(1-p_bar)/n)
+    ucl = p_bar + 3*se
+    lcl = np.maximum(0, p_bar - 3*se)
+    viol = detect_violations(p, ucl, lcl, p_bar, rules, params)
+    return ChartResult("p", (ControlSeries("p", x, p, p_bar, ucl, lcl, viol),), {"p_bar": p_bar, "total_n": n.sum(), "total_ng": ng.sum()})
+
+def np_chart(x, n, ng, rules=ALL_RULES, params=None, p_bar=None):
+    n = np.asarray(n, dtype=float); ng = np.asarray(ng, dtype=float); x = np.asarray(x)
+    keep = n > 0
+    x, n, ng = x[keep], n[keep], ng[keep]
+    if len(n) < 3: return ChartResult("np", message="Minimal 3 periode.")
+    n_bar  = n.mean()
+    p_bar  = ng.sum() / n.sum() if p_bar is None else p_bar
+    np_bar = n_bar * p_bar
+    ucl = np_bar + 3*np.sqrt(np_bar*(1-p_bar))
+    lcl = max(0, np_bar - 3*np.sqrt(np_bar*(1-p_bar)))
+    cv  = n.std(ddof=1) / n_bar
+    viol = detect_violations(ng, ucl, lcl, np_bar, rules, params)
+    return ChartResult("np", (ControlSeries("np", x, ng, np_bar, ucl, lcl, viol),), {"n_bar": n_bar, "p_bar": p_bar, "np_bar": np_bar, "sample_cv": cv})
+
+def c_chart(x, c, rules=ALL_RULES, params=None, c_bar=None):
+    c = np.asarray(c, dtype=float); x = np.asarray(x)
+    if len(c) < 3: return ChartResult("c", message="Minimal 3 periode.")
+    c_bar = c.mean() if c_bar is None else c_bar
+    ucl = c_bar + 3*np.sqrt(c_bar)
+    lcl = max(0, c_bar - 3*np.sqrt(c_bar))
+    viol = detect_violations(c, ucl, lcl, c_bar, rules, params)
+    return ChartResult("c", (ControlSeries("c", x, c, c_bar, ucl, lcl, viol),), {"c_bar": c_bar})
+
+def u_chart(x, n, ng, rules=ALL_RULES, params=None, u_bar=None):
+    n = np.asarray(n, dtype=float); ng = np.asarray(ng, dtype=float); x = np.asarray(x)
+    keep = n > 0
+    x, n, ng = x[keep], n[keep], ng[keep]
+    if len(n) < 3: return ChartResult("u", message="Minimal 3 periode.")
+    u = ng / n
+    u_bar = ng.sum() / n.sum() if u_bar is None else u_bar
+    ucl = u_bar + 3*np.sqrt(u_bar/n)
+    lcl = np.maximum(0, u_bar - 3*np.sqrt(u_bar/n))
+    viol = detect_violations(u, ucl, lcl, u_bar, rules, params)
+    return ChartResult("u", (ControlSeries("u", x, u, u_bar, ucl, lcl, viol),), {"u_bar": u_bar, "total_n": n.sum(), "total_ng": ng.sum()})
+
+def imr_chart(values, x=None, rules=ALL_RULES, params=None, x_bar=None, mr_bar=None):
+    vals = np.asarray(values, dtype=float)
+    if len(vals) < 5: return ChartResult("imr", message="Minimal 5 data.")
+    x = np.arange(1, len(vals)+1) if x is None else np.asarray(x)
+    mr = np.abs(np.diff(vals))
+    x_bar  = vals.mean() if x_bar is None else x_bar
+    mr_bar = mr.mean() if mr_bar is None else mr_bar
+    E2, D4_mr, D3_mr, d2 = 2.660, 3.267, 0.0, 1.128
+    ucl_i, lcl_i   = x_bar + E2*mr_bar, x_bar - E2*mr_bar
+    ucl_mr, lcl_mr = D4_mr*mr_bar, D3_mr*mr_bar
+    s_i  = ControlSeries("Individual", x, vals, x_bar, ucl_i, lcl_i, detect_violations(vals, ucl_i, lcl_i, x_bar, rules, params))
+    s_mr = ControlSeries("MR", x[1:], mr, mr_bar, ucl_mr, lcl_mr, detect_violations(mr, ucl_mr, lcl_mr, mr_bar, rules, params))
+    return ChartResult("imr", (s_i, s_mr), {"x_bar": x_bar, "mr_bar": mr_bar, "sigma": mr_bar/d2, "ucl_i": ucl_i, "lcl_i": lcl_i})
+
+# -- subgroup engine --
+# One sort + reduceat pass gives size, mean, range and std of every subgroup.
+# With a subgroup column, sizes may differ: σ is estimated as mean(Rᵢ/d2(nᵢ))
+# or mean(sᵢ/c4(nᵢ)) and limits are per subgroup (σ/√nᵢ for X̄, d2/d3 or c4 at
+# nᵢ for R/S). With equal sizes this is the classic A2/D3/D4 or A3/B3/B4 form,
+# and limits collapse to scalars.
+
+def subgroup_stats(values, codes):
+    v = np.asarray(values, dtype=float); codes = np.asarray(codes)
+    keep = ~np.isnan(v) & (codes >= 0)
+    v, codes = v[keep], codes[keep]
+    if len(codes) > 1 and (codes[1:] < codes[:-1]).any():
+        order = np.argsort(codes, kind="stable")
+        v, codes = v[order], codes[order]
+    if not len(v): return codes, np.empty(0, np.int64), v, v, v
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    n = np.diff(np.r_[starts, len(v)])
+    mean = np.add.reduceat(v, starts) / n
+    dev = v - np.repeat(mean, n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.where(n > 1, np.sqrt(np.add.reduceat(dev * dev, starts) / (n - 1)), np.nan)
+    rng = np.maximum.reduceat(v, starts) - np.minimum.reduceat(v, starts)
+    return codes[starts], n, mean, rng, std
+
+def _subgroups(df, meas_col, subg_col, n, stat):
+    if subg_col and subg_col in df.columns:
+        codes, labels = pd.factorize(df[subg_col], sort=True)
+        g, sizes, mean, rng, std = subgroup_stats(df[meas_col].to_numpy(dtype=float, na_value=np.nan), codes)
+        x = np.asarray(labels)[g]
+    else:
+        vals = df[meas_col].to_numpy(dtype=float, na_value=np.nan); vals = vals[~np.isnan(vals)]
+        n_use = int(n); num_g = len(vals) // n_use
+        g = vals[:num_g * n_use].reshape(num_g, n_use)          # equal consecutive subgroups: plain axis reductions
+        sizes, mean = np.full(num_g, n_use), g.mean(axis=1)
+        rng = g.max(axis=1) - g.min(axis=1) if stat == "range" else None
+        std = g.std(axis=1, ddof=1) if stat == "std" and n_use > 1 else np.full(num_g, np.nan)
+        x = np.arange(1, num_g + 1)
+    ok = sizes >= 2                                      # a single reading has no range or std
+    if ok.sum() < 3: return None
+    return x[ok], sizes[ok], mean[ok], (rng if stat == "range" else std)[ok]
+
+def _collapse(a):
+    return float(a[0]) if np.ptp(a) == 0 else a
+
+def _xbar_series(x, sizes, xbar, sigma, rules, params):
+    xbar_bar = float(np.sum(sizes * xbar) / np.sum(sizes))
+    half = 3 * sigma / np.sqrt(sizes)
+    ucl, lcl = _collapse(xbar_bar + half), _collapse(xbar_bar - half)
+    return ControlSeries("X̄", x, xbar, xbar_bar, ucl, lcl, detect_violations(xbar, ucl, lcl, xbar_bar, rules, params)), xbar_bar
+
+def _size_stats(sizes):
+    return {"n": int(sizes[0]) if np.ptp(sizes) == 0 else float(sizes.mean()), "n_min": int(sizes.min()), "n_max": int(sizes.max()), "subgroups": len(sizes)}
+
+def xbar_r_chart(df, meas_col, subg_col=None, n=5, rules=ALL_RULES, params=None):
+    sg = _subgroups(df, meas_col, subg_col, n, "range")
+    if sg is None: return ChartResult("xbar_r", message="Tidak cukup data subgroup.")
+    x, sizes, xbar, r_vals = sg
+    d2, d3 = range_constants_for(sizes)
+    sigma = float(np.mean(r_vals / d2))
+    s_x, xbar_bar = _xbar_series(x, sizes, xbar, sigma, rules, params)
+    cl_r, ucl_r, lcl_r = _collapse(d2 * sigma), _collapse((d2 + 3*d3) * sigma), _collapse(np.maximum(0, d2 - 3*d3) * sigma)
+    s_r = ControlSeries("R", x, r_vals, cl_r, ucl_r, lcl_r, detect_violations(r_vals, ucl_r, lcl_r, cl_r, rules, params))
+    return ChartResult("xbar_r", (s_x, s_r), {**_size_stats(sizes), "xbar_bar": xbar_bar, "r_bar": float(r_vals.mean()), "sigma": sigma})
+
+def xbar_s_chart(df, meas_col, subg_col=None, n=10, rules=ALL_RULES, params=None):
+    sg = _subgroups(df, meas_col, subg_col, n, "std")
+    if sg is None: return ChartResult("xbar_s", message="Tidak cukup data subgroup.")
+    x, sizes, xbar, s_vals = sg
+    c = c4(sizes)
+    sigma = float(np.mean(s_vals / c))
+    s_x, xbar_bar = _xbar_series(x, sizes, xbar, sigma, rules, params)
+    k = 3 * np.sqrt(1 - c * c)
+    cl_s, ucl_s, lcl_s = _collapse(c * sigma), _collapse((c + k) * sigma), _collapse(np.maximum(0, c - k) * sigma)
+    s_s = ControlSeries("S", x, s_vals, cl_s, ucl_s, lcl_s, detect_violations(s_vals, ucl_s, lcl_s, cl_s, rules, params))
+    return ChartResult("xbar_s", (s_x, s_s), {**_size_stats(sizes), "xbar_bar": xbar_bar, "s_bar": float(s_vals.mean()), "sigma": sigma})
+
+# -- DataFrame entry points --
+def _period_sums(df, date_col, cols):
+    daily = df.groupby(date_col)[cols].sum()
+    return daily.index.to_numpy(), [daily[c].to_numpy() for c in cols]
+
+def compute_p_chart(df, date_col, qty_col, ng_col, **kw):
+    x, (n, ng) = _period_sums(df, date_col, [qty_col, ng_col]); return p_chart(x, n, ng, **kw)
+
+def compute_np_chart(df, date_col, qty_col, ng_col, **kw):
+    x, (n, ng) = _period_sums(df, date_col, [qty_col, ng_col]); return np_chart(x, n, ng, **kw)
+
+def compute_c_chart(df, date_col, ng_col, **kw):
+    x, (c,) = _period_sums(df, date_col, [ng_col]); return c_chart(x, c, **kw)
+
+def compute_u_chart(df, date_col, qty_col, ng_col, **kw):
+    x, (n, ng) = _period_sums(df, date_col, [qty_col, ng_col]); return u_chart(x, n, ng, **kw)
+
+def compute_imr_chart(df, meas_col, date_col=None, **kw):
+    valid = df[meas_col].notna().to_numpy()
+    x = df[date_col].to_numpy()[valid] if date_col and date_col in df.columns else None
+    return imr_chart(df[meas_col].to_numpy()[valid], x, **kw)
+
+def compute_xbar_r_chart(df, meas_col, subg_col=None, n=5, **kw):
+    return xbar_r_chart(df, meas_col, subg_col, n, **kw)
+
+def compute_xbar_s_chart(df, meas_col, subg_col=None, n=10, **kw):
+    return xbar_s_chart(df, meas_col, subg_col, n, **kw)
+
+# ===================================================================
+# STRATA SCREENING (all combinations, one pass)
+# ===================================================================
+# One groupby over strata × period, per-stratum centre lines via group sums,
+# per-point p/u limits, and a single grouped rule pass. Returns one row per
+# stratum ranked worst-first: latest period out of control, then beyond-3σ
+# count, then total violations, then the largest |z| seen.
+
+def screen_strata(df, date_col, qty_col, ng_col, strat_cols, chart="p", rules=ALL_RULES, params=None, min_periods=3):
+    strat_cols = list(strat_cols)
+    g = df.groupby(strat_cols + [date_col], observed=True, sort=True)[[qty_col, ng_col]].sum()
+    g = g[g[qty_col] > 0]
+    if g.empty: return pd.DataFrame()
+    codes = g.groupby(level=strat_cols, observed=True, sort=True).ngroup().to_numpy()
+    n  = g[qty_col].to_numpy(dtype=float)
+    ng = g[ng_col].to_numpy(dtype=float)
+    n_groups = codes.max() + 1
+    periods = np.bincount(codes, minlength=n_groups)
+    tot_n   = np.bincount(codes, weights=n,  minlength=n_groups)
+    tot_ng  = np.bincount(codes, weights=ng, minlength=n_groups)
+    cbar    = (tot_ng / tot_n)[codes]
+    val     = ng / n
+    se      = np.sqrt(cbar*(1-cbar)/n) if chart == "p" else np.sqrt(cbar/n)
+    ucl, lcl = cbar + 3*se, np.maximum(0, cbar - 3*se)
+    viol = detect_violations(val, ucl, lcl, cbar, rules, params, groups=codes)
+
+    flagged = np.zeros(len(val), dtype=np.int64)
+    for idxs in viol.values(): np.add.at(flagged, idxs, 1)
+    beyond = np.zeros(len(val), dtype=np.int64)
+    if 1 in viol: beyond[viol[1]] = 1
+    z = np.abs(val - cbar) / np.where(se > 0, se, np.inf)
+    last = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])   # rows are sorted by stratum then date
+    order_codes = codes[last]
+
+    out = g.index.to_frame(index=False).iloc[last][strat_cols].reset_index(drop=True)
+    out["periods"]      = periods[order_codes]
+    out["total_n"]      = tot_n[order_codes]
+    out["total_ng"]     = tot_ng[order_codes]
+    out[f"{chart}_bar"] = (tot_ng / tot_n)[order_codes]
+    out["last_period"]  = g.index.get_level_values(date_col)[last]
+    out[f"last_{chart}"] = val[last]
+    out["last_ucl"]     = ucl[last]
+    out["last_violation"] = flagged[last] > 0
+    out["n_beyond"]     = np.bincount(codes, weights=beyond, minlength=n_groups)[order_codes].astype(np.int64)
+    out["n_violations"] = np.bincount(codes, weights=flagged > 0, minlength=n_groups)[order_codes].astype(np.int64)
+    out["max_z"]        = np.maximum.reduceat(z, np.r_[0, last[:-1] + 1])
+    out = out[out["periods"] >= min_periods]
+    return out.sort_values(["last_violation", "n_beyond", "n_violations", "max_z"], ascending=False, ignore_index=True)
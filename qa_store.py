@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ===================================================================
+# HISTORICAL STORE (SQLite)
+# ===================================================================
+# Uploads are appended once (rows deduplicated by source file + a content hash
+# of the row) and reduced to sufficient statistics per stratum and day:
+# Σn, ΣNG for attribute data and count, Σx, Σx², Σ|MR|, #MR per measurement
+# column. A totals table is updated in the same transaction, so p̄/ū/c̄/X̄/MR̄
+# for any stored stratum are read in O(1) instead of recomputed from history.
+#
+# Strata are the whole dataset ("*") plus one stratum per value of each
+# stratification column ("Line=L1"), which is what the global filter selects.
+
+STORE_PATH = os.environ.get("QA_STORE_PATH", os.path.join(os.path.expanduser("~"), ".local", "share", "qa_system", "history.sqlite"))
+ALL_STRATUM = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows_seen  (source_file TEXT NOT NULL, row_key INTEGER NOT NULL, PRIMARY KEY (source_file, row_key)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS attr_stats (stratum TEXT NOT NULL, period TEXT NOT NULL, n REAL NOT NULL, ng REAL NOT NULL, PRIMARY KEY (stratum, period)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS var_stats  (stratum TEXT NOT NULL, period TEXT NOT NULL, col TEXT NOT NULL, cnt INTEGER NOT NULL, sx REAL NOT NULL, sxx REAL NOT NULL,
+                                       mr_sum REAL NOT NULL, mr_cnt INTEGER NOT NULL, PRIMARY KEY (stratum, period, col)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS attr_total (stratum TEXT PRIMARY KEY, n REAL NOT NULL, ng REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS var_total  (stratum TEXT NOT NULL, col TEXT NOT NULL, cnt INTEGER NOT NULL, sx REAL NOT NULL, sxx REAL NOT NULL,
+                                       mr_sum REAL NOT NULL, mr_cnt INTEGER NOT NULL, last REAL, last_ts INTEGER, PRIMARY KEY (stratum, col)) WITHOUT ROWID;
+"""
+
+def _canonical(s):
+    # dtype-free form of a column: the same cell hashes the same whether this upload stored it
+    # as int8, int64, float, category or str (dtypes come from the whole combined upload)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        if getattr(s.dt, "tz", None) is not None: s = s.dt.tz_convert("UTC").dt.tz_localize(None)
+        return s.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    if (pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype)) and not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.to_numpy(dtype=np.float64, na_value=np.nan)
+    return s.astype("string").fillna("\x00").to_numpy(dtype=object)
+
+def source_files(df):
+    return df["_source_file"].astype(str).to_numpy() if "_source_file" in df.columns else np.full(len(df), "")
+
+def row_keys(df):
+    # content hash of the row, salted with its occurrence number within its source file, so identical rows
+    # in one file all count and a file's keys do not depend on which other files came in the same upload
+    cols = [c for c in df.columns if not str(c).startswith("_")]
+    h = pd.util.hash_pandas_object(pd.DataFrame({i: _canonical(df[c]) for i, c in enumerate(cols)}, index=df.index), index=False).to_numpy()
+    occ = pd.Series(h).groupby([source_files(df), h]).cumcount().to_numpy().astype(np.uint64)
+    return pd.util.hash_array(h ^ (occ * np.uint64(0x9E3779B97F4A7C15))).view(np.int64)
+
+def stratum_keys(df, strat_cols):
+    yield ALL_STRATUM, pd.Series(ALL_STRATUM, index=df.index)
+    for c in strat_cols:
+        yield c, (c + "=" + df[c].astype("string")).fillna(c + "=")
+
+class HistoryStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as con:
+            con.executescript(SCHEMA)
+            if "last_ts" not in {r[1] for r in con.execute("PRAGMA table_info(var_total)")}:
+                con.execute("ALTER TABLE var_total ADD COLUMN last_ts INTEGER")      # stores from before last_ts
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con: yield con          # one transaction, committed on success
+        finally:
+            con.close()
+
+    # -- append --
+    def _new_rows(self, con, df):
+        keys = row_keys(df)
+        src  = source_files(df)
+        frame = pd.DataFrame({"source_file": src, "row_key": keys})
+        seen = []
+        for f in pd.unique(src):
+            seen.append(pd.read_sql_query("SELECT source_file, row_key FROM rows_seen WHERE source_file = ?", con, params=(f,)))
+        seen = pd.concat(seen, ignore_index=True) if seen else frame.iloc[:0]
+        new = ~pd.MultiIndex.from_frame(frame).isin(pd.MultiIndex.from_frame(seen))
+        con.executemany("INSERT OR IGNORE INTO rows_seen VALUES (?, ?)", frame[new].itertuples(index=False, name=None))
+        return new
+
+    def append(self, df, mapping):
+        date_col, n_col, ng_col = mapping.get("date"), mapping.get("sample_size"), mapping.get("defect_count")
+        meas_cols  = [c for c in mapping.get("measurement", []) if c in df.columns]
+        strat_cols = [c for c in mapping.get("strat_cols", []) if c in df.columns]
+        with self._lock, self._connect() as con:
+            new = self._new_rows(con, df)
+            d = df.loc[new]
+            if d.empty: return {"new_rows": 0, "duplicates": int(len(df))}
+            period = pd.to_datetime(d[date_col], errors="coerce").dt.strftime("%Y-%m-%d").fillna("") if date_col else pd.Series("", index=d.index)
+            ts = None
+            if date_col:
+                d = d.assign(_ts=pd.to_datetime(d[date_col], errors="coerce")).sort_values("_ts", kind="stable")
+                period = period.loc[d.index]
+                ts = d["_ts"]
+            for _, skey in stratum_keys(d, strat_cols):
+                if n_col and ng_col and date_col:
+                    a = pd.DataFrame({"stratum": skey, "period": period, "n": d[n_col], "ng": d[ng_col]}).groupby(["stratum", "period"], sort=False)[["n", "ng"]].sum().reset_index()
+                    con.executemany("INSERT INTO attr_stats VALUES (?,?,?,?) ON CONFLICT(stratum, period) DO UPDATE SET n = n + excluded.n, ng = ng + excluded.ng", a.itertuples(index=False, name=None))
+                    t = a.groupby("stratum")[["n", "ng"]].sum().reset_index()
+                    con.executemany("INSERT INTO attr_total VALUES (?,?,?) ON CONFLICT(stratum) DO UPDATE SET n = n + excluded.n, ng = ng + excluded.ng", t.itertuples(index=False, name=None))
+                for col in meas_cols:
+                    self._append_var(con, skey, period, d[col], col, ts)
+        return {"new_rows": int(new.sum()), "duplicates": int(len(df) - new.sum())}
+
+    def _append_var(self, con, skey, period, values, col, ts=None):
+        # ts: reading timestamps in ascending order (NaT last), None without a date column
+        v = pd.DataFrame({"stratum": skey, "period": period, "x": pd.to_numeric(values, errors="coerce").astype(float),
+                          "ts": ts if ts is not None else pd.NaT}).dropna(subset=["x"])
+        if v.empty: return
+        prior = {s: (x, t) for s, x, t in con.execute("SELECT stratum, last, last_ts FROM var_total WHERE col = ?", (col,))}
+        prev = v.groupby("stratum", sort=False)["x"].shift()
+        first = prev.isna()
+        # chain MR onto the stored last reading only when this append continues after it in time;
+        # a backfill (older dates) starts a fresh MR chain. Without dates both sides are unknown: upload order.
+        def chained(stratum, t0):
+            x, t = prior.get(stratum, (None, None))
+            if x is None: return np.nan
+            if t is None or pd.isna(t0): return x if t is None and pd.isna(t0) else np.nan
+            return x if t0.value >= t else np.nan
+        prev[first] = [chained(s_, t0) for s_, t0 in zip(v.loc[first, "stratum"], v.loc[first, "ts"])]
+        v["mr"] = (v["x"] - prev).abs()
+        v["xx"] = v["x"] ** 2
+        g = v.groupby(["stratum", "period"], sort=False).agg(cnt=("x", "size"), sx=("x", "sum"), sxx=("xx", "sum"), mr_sum=("mr", "sum"), mr_cnt=("mr", "count")).reset_index()
+        g.insert(2, "col", col)
+        con.executemany("""INSERT INTO var_stats VALUES (?,?,?,?,?,?,?,?) ON CONFLICT(stratum, period, col) DO UPDATE SET
+                           cnt = cnt + excluded.cnt, sx = sx + excluded.sx, sxx = sxx + excluded.sxx, mr_sum = mr_sum + excluded.mr_sum, mr_cnt = mr_cnt + excluded.mr_cnt""",
+                        g.itertuples(index=False, name=None))
+        t = g.groupby("stratum", sort=False)[["cnt", "sx", "sxx", "mr_sum", "mr_cnt"]].sum()
+        tail = v.groupby("stratum", sort=False).tail(1).set_index("stratum")
+        t["last"] = tail["x"]
+        t["last_ts"] = pd.Series([None if pd.isna(x) else x.value for x in tail["ts"]], index=tail.index, dtype=object)
+        t.insert(0, "col", col)
+        # the stored last reading only moves forward in time (or follows upload order without dates)
+        con.executemany("""INSERT INTO var_total VALUES (?,?,?,?,?,?,?,?,?) ON CONFLICT(stratum, col) DO UPDATE SET
+                           cnt = cnt + excluded.cnt, sx = sx + excluded.sx, sxx = sxx + excluded.sxx, mr_sum = mr_sum + excluded.mr_sum, mr_cnt = mr_cnt + excluded.mr_cnt,
+                           last    = CASE WHEN last_ts IS NULL OR excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+                           last_ts = CASE WHEN last_ts IS NULL OR excluded.last_ts >= last_ts THEN excluded.last_ts ELSE last_ts END""",
+                        t.reset_index()[["stratum", "col", "cnt", "sx", "sxx", "mr_sum", "mr_cnt", "last", "last_ts"]].itertuples(index=False, name=None))
+
+    # -- read --
+    def limits(self, stratum=ALL_STRATUM):
+        with self._connect() as con:
+            out = {"stratum": stratum, "periods": 0, "measurement": {}}
+            row = con.execute("SELECT n, ng FROM attr_total WHERE stratum = ?", (stratum,)).fetchone()
+            if row and row[0] > 0:
+                periods = con.execute("SELECT COUNT(*) FROM attr_stats WHERE stratum = ?", (stratum,)).fetchone()[0]
+                out.update(periods=periods, total_n=row[0], total_ng=row[1], p_bar=row[1]/row[0], u_bar=row[1]/row[0], c_bar=row[1]/max(periods, 1))
+            for col, cnt, sx, sxx, mr_sum, mr_cnt in con.execute("SELECT col, cnt, sx, sxx, mr_sum, mr_cnt FROM var_total WHERE stratum = ?", (stratum,)):
+                mean = sx / cnt
+                var  = max(sxx - cnt*mean*mean, 0) / (cnt - 1) if cnt > 1 else 0.0
+                out["measurement"][col] = {"count": cnt, "x_bar": mean, "std": var ** 0.5, "mr_bar": mr_sum / mr_cnt if mr_cnt else None}
+            return out
+
+    def summary(self):
+        with self._connect() as con:
+            return pd.read_sql_query("""SELECT t.stratum, COUNT(s.period) AS periods, MIN(s.period) AS first_period, MAX(s.period) AS last_period, t.n AS total_n, t.ng AS total_ng
+                                        FROM attr_total t LEFT JOIN attr_stats s ON s.stratum = t.stratum GROUP BY t.stratum ORDER BY t.stratum""", con)
+
+    def clear(self):
+        with self._lock, self._connect() as con:
+            for t in ("rows_seen", "attr_stats", "var_stats", "attr_total", "var_total"): con.execute(f"DELETE FROM {t}")
+
+_stores = {}
+
+def get_history_store(path=STORE_PATH):
+    if path not in _stores: _stores[path] = HistoryStore(path)
+    return _stores[path]
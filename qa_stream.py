@@ -0,0 +1,205 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from qa_cache import content_key, get_dataset_registry, get_parse_cache
+from qa_detect import apply_profile, auto_detect_all_columns, get_mapping_profiles, schema_fingerprint
+from qa_ingest import EXCEL_EXT, PARSER_VERSION, coerce_datetime_columns, compact_frame, file_ext, infer_datetime_format, parse_datetime, parse_file, reader_options, sample_series
+from qa_trace import span
+
+# ===================================================================
+# CHUNKED STREAMING INGESTION
+# ===================================================================
+# For CSV/TSV exports that do not fit in memory. Column roles are detected on
+# the first chunk; every chunk is then rolled up to one row per
+# (day, strata..., defect type, source file) with summed count columns, so the
+# p/np/c/u charts, Pareto, stratification and weekly trend (all group-and-sum)
+# run unchanged on the result. Measurement columns are kept only as a bounded
+# reservoir sample (rows in original order, count columns left empty so sums
+# are not double counted). Memory is bounded by strata cardinality and the
+# reservoir size, not by the file size.
+
+STREAM_CHUNK_ROWS = 200_000
+RESERVOIR_ROWS    = 100_000
+KEY_ROLES   = ("date", "defect_type", "line", "product", "size_variant", "categorical")
+SUM_ROLES   = ("sample_size", "defect_count", "numeric_count")
+MEAS_ROLES  = ("measurement",)
+
+class Reservoir:
+    # Algorithm R, vectorized per chunk
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.rng  = np.random.default_rng(seed)
+        self.cols = None
+        self.row  = np.empty(size, dtype=np.int64)
+
+    def add(self, chunk):
+        m = len(chunk)
+        if m == 0: return
+        if self.cols is None:
+            self.cols = {c: np.empty(self.size, dtype=chunk[c].to_numpy().dtype) for c in chunk.columns}
+        g = self.seen + np.arange(m)
+        fill = g < self.size
+        src = np.flatnonzero(fill); dst = g[fill]
+        rest = np.flatnonzero(~fill)
+        if len(rest):
+            j = self.rng.integers(0, g[rest] + 1)
+            keep = j < self.size
+            rsrc, rdst = rest[keep], j[keep]
+            # sequential semantics: when a slot is hit twice in one chunk the later row wins
+            rdst_rev, first = np.unique(rdst[::-1], return_index=True)
+            src = np.concatenate([src, rsrc[::-1][first]]); dst = np.concatenate([dst, rdst_rev])
+        for c, arr in self.cols.items():
+            vals = chunk[c].to_numpy()
+            if vals.dtype != arr.dtype and not np.can_cast(vals.dtype, arr.dtype):
+                arr = self.cols[c] = arr.astype(object)
+            arr[dst] = vals[src]
+        self.row[dst] = g[src]
+        self.seen += m
+
+    def frame(self):
+        k = min(self.seen, self.size)
+        if self.cols is None: return pd.DataFrame()
+        order = np.argsort(self.row[:k], kind="stable")
+        return pd.DataFrame({c: arr[:k][order] for c, arr in self.cols.items()})
+
+class StreamAggregator:
+    def __init__(self, detected, date_fmt=None, reservoir_rows=RESERVOIR_ROWS, seed=0, compact_rows=500_000):
+        self.detected  = detected
+        self.date_col  = next((c for c, r in detected.items() if r == "date"), None)
+        self.date_fmt  = date_fmt
+        # only the primary date column is a key; other timestamp-like columns would explode the rollup
+        self.key_cols  = ([self.date_col] if self.date_col else []) + [c for c, r in detected.items() if r in KEY_ROLES and r != "date"] + ["_source_file"]
+        self.sum_cols  = [c for c, r in detected.items() if r in SUM_ROLES]
+        self.meas_cols = [c for c, r in detected.items() if r in MEAS_ROLES]
+        self.reservoir = Reservoir(reservoir_rows, seed) if self.meas_cols else None
+        self.compact_rows = compact_rows
+        self.parts = []
+        self.rows  = 0
+
+    def _prepare(self, chunk):
+        # later files may lack some of the first file's columns; align to the detected schema
+        for c in self.key_cols[:-1] + self.sum_cols + self.meas_cols:
+            if c not in chunk.columns: chunk[c] = np.nan
+        if self.date_col and self.date_col in chunk.columns and not pd.api.types.is_datetime64_any_dtype(chunk[self.date_col]):
+            if self.date_fmt: chunk[self.date_col] = parse_datetime(chunk[self.date_col], self.date_fmt)[0]
+            else: chunk[self.date_col] = pd.to_datetime(chunk[self.date_col], errors="coerce")
+        for c in self.sum_cols + self.meas_cols:
+            if c in chunk.columns and not pd.api.types.is_numeric_dtype(chunk[c]):
+                chunk[c] = pd.to_numeric(chunk[c], errors="coerce")
+        return chunk
+
+    def _rollup(self, part):
+        return part.groupby(self.key_cols, dropna=False, sort=False, observed=True)[self.sum_cols].sum().reset_index()
+
+    def add(self, chunk, source):
+        chunk = self._prepare(chunk)
+        chunk["_source_file"] = source
+        self.rows += len(chunk)
+        if self.reservoir is not None:
+            self.reservoir.add(chunk[self.key_cols + self.meas_cols])
+        if self.sum_cols:
+            keys = chunk[self.key_cols + self.sum_cols].copy()
+            if self.date_col: keys[self.date_col] = keys[self.date_col].dt.floor("D")
+            self.parts.append(self._rollup(keys))
+            if sum(len(p) for p in self.parts) > self.compact_rows:
+                self.parts = [self._rollup(pd.concat(self.parts, ignore_index=True))]
+
+    def result(self):
+        frames = []
+        if self.parts:
+            frames.append(self._rollup(pd.concat(self.parts, ignore_index=True)))
+        if self.reservoir is not None:
+            frames.append(self.reservoir.frame())
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        cols = [c for c in self.detected if c in df.columns] + ["_source_file"]
+        df = df[cols]
+        df.attrs["qa_detected"] = {c: r for c, r in self.detected.items() if c in df.columns}
+        df.attrs["qa_rows_read"] = self.rows
+        return df
+
+# Server-side paths (files too large to upload) are only read from below
+# QA_STREAM_DIR; without it the dashboard accepts uploads only. Paths are
+# resolved with realpath, so ".." and symlinks cannot leave the root.
+STREAM_DIR = os.environ.get("QA_STREAM_DIR") or None
+SERVER_EXT = ("csv", "tsv", "txt") + EXCEL_EXT
+
+def resolve_server_path(path, root=STREAM_DIR):
+    # -> absolute real path of a data file inside root; ValueError otherwise
+    if not root: raise ValueError("path server tidak diaktifkan (QA_STREAM_DIR tidak di-set)")
+    base = os.path.realpath(root)
+    real = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, real]) != base: raise ValueError(f"{path}: di luar direktori data server")
+    if file_ext(real) not in SERVER_EXT: raise ValueError(f"{path}: tipe file tidak didukung")
+    if not os.path.isfile(real): raise ValueError(f"{path}: file tidak ditemukan")
+    return real
+
+def _source_name(src):
+    return src if isinstance(src, str) else src.name
+
+def _open_chunks(src, sep, chunk_rows):
+    if not isinstance(src, str): src.seek(0)
+    return pd.read_csv(src, sep=sep, chunksize=chunk_rows, low_memory=True)
+
+def stream_sources(sources, chunk_rows=STREAM_CHUNK_ROWS, reservoir_rows=RESERVOIR_ROWS, progress=None, profiles=None):
+    agg, fingerprint = None, None
+    for i, src in enumerate(sources):
+        name = _source_name(src)
+        opts = reader_options(os.path.basename(name))
+        if opts["kind"] == "excel":
+            # workbooks cannot be read in chunks; parse whole and feed as one chunk
+            if isinstance(src, str):
+                with open(src, "rb") as f: data = f.read()
+            else: data = src.getvalue()
+            chunks = [parse_file(data, opts)]
+        else:
+            chunks = _open_chunks(src, opts["sep"], chunk_rows)
+        with span("stream.file", kind=opts["kind"]) as sp:
+            rows0 = agg.rows if agg else 0
+            for chunk in chunks:
+                if agg is None:
+                    raw = chunk.copy()
+                    chunk = coerce_datetime_columns(chunk)
+                    fingerprint = schema_fingerprint(chunk)
+                    profile = profiles.get(fingerprint) if profiles else None
+                    detected = apply_profile(chunk, profile)[0] if profile else auto_detect_all_columns(chunk)
+                    date_col = next((c for c, r in detected.items() if r == "date"), None)
+                    fmt = None
+                    if date_col and not pd.api.types.is_datetime64_any_dtype(raw[date_col]):
+                        fmt = infer_datetime_format(sample_series(raw[date_col]).astype(str))
+                    agg = StreamAggregator(detected, fmt, reservoir_rows)
+                agg.add(chunk, os.path.basename(name))
+                if progress: progress(i, name, agg.rows)
+            sp["rows"] = agg.rows - rows0 if agg else 0
+    if agg is None: return pd.DataFrame()
+    df = agg.result()
+    df.attrs["qa_schema"] = fingerprint
+    return df
+
+def stream_cache_key(sources, chunk_rows=STREAM_CHUNK_ROWS, reservoir_rows=RESERVOIR_ROWS, profiles=None):
+    parts = []
+    for src in sources:
+        if isinstance(src, str):
+            st_ = os.stat(src); parts.append(f"{os.path.abspath(src)}|{st_.st_size}|{st_.st_mtime_ns}")
+        else:
+            parts.append(content_key(src.getvalue()))
+    return content_key("\n".join(parts).encode(), mode="stream", version=PARSER_VERSION, chunk=chunk_rows, reservoir=reservoir_rows,
+                       profiles=profiles.token() if profiles else 0)
+
+def load_streaming(sources, cache=None, progress=None, profiles=None, registry=None):
+    # roles come from a saved mapping profile when one matches; saving a profile changes the key
+    cache, profiles = cache or get_parse_cache(), profiles or get_mapping_profiles()
+    registry = registry or get_dataset_registry()
+    key = stream_cache_key(sources, profiles=profiles)
+    df = registry.get(key)
+    if df is None:
+        df = cache.get(key, memory=False)
+        if df is None:
+            df = compact_frame(stream_sources(sources, progress=progress, profiles=profiles))
+            cache.put(key, df, memory=False)
+        df = registry.put(key, df)
+    df.attrs["qa_source_key"] = key
+    detected = df.attrs.get("qa_detected") or auto_detect_all_columns(df)
+    return df, detected
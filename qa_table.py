@@ -0,0 +1,121 @@
+import io
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# ===================================================================
+# PAGINATED TABLE VIEW (server-side sort / search)
+# ===================================================================
+# The Raw Data tab sends one page of rows to the browser, not the whole
+# filtered frame. Sort orders are positional index arrays cached per view and
+# column; text search on a categorical column matches the categories, not
+# every row. A page is then a slice of positions taken with iloc.
+
+PAGE_SIZES = (50, 100, 500, 1000)
+MAX_CACHED_ORDERS = 16
+
+_orders = OrderedDict()
+_orders_lock = threading.Lock()
+
+def sort_order(df, col, ascending=True, view_key=None):
+    key = None if view_key is None else (view_key, len(df), col, ascending)
+    if key is not None:
+        with _orders_lock:
+            order = _orders.get(key)
+            if order is not None:
+                _orders.move_to_end(key); return order
+    s = df[col].reset_index(drop=True)
+    order = s.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+    order.flags.writeable = False
+    if key is not None:
+        with _orders_lock:
+            _orders[key] = order
+            while len(_orders) > MAX_CACHED_ORDERS: _orders.popitem(last=False)
+    return order
+
+def search_mask(s, text):
+    text = text.strip().lower()
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        hit = s.cat.categories.astype(str).str.lower().str.contains(text, regex=False)
+        lut = np.append(np.asarray(hit, dtype=bool), False)         # last slot catches code -1
+        return lut[s.cat.codes.to_numpy()]
+    return s.astype(str).str.lower().str.contains(text, regex=False).to_numpy(dtype=bool, na_value=False) & s.notna().to_numpy()
+
+def view_positions(df, sort_col=None, ascending=True, search_col=None, text="", view_key=None):
+    pos = sort_order(df, sort_col, ascending, view_key) if sort_col else np.arange(len(df))
+    if search_col and text.strip():
+        pos = pos[search_mask(df[search_col], text)[pos]]
+    return pos
+
+def page_slice(df, pos, page, page_size):
+    n_pages = max(1, -(-len(pos) // page_size))
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    return df.iloc[pos[start:start + page_size]], start, n_pages
+
+# ===================================================================
+# ON-DEMAND EXPORT (chunked)
+# ===================================================================
+# Called only when the download button is clicked. Rows are written in chunks
+# to a spooled temp file (spills to disk past EXPORT_SPOOL_BYTES), so only the
+# finished file, never an intermediate full text copy, is held alongside the
+# data; the download button gets that file as bytes.
+
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_SPOOL_BYTES = 64 * 1024**2
+XLSX_MAX_ROWS = 1_048_575            # sheet row limit minus the header
+
+EXPORT_FORMATS = {
+    "CSV":     ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "XLSX":    ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def export_formats():
+    return [f for f in EXPORT_FORMATS if f != "Parquet" or HAS_PARQUET]
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_csv(df, f, chunk_rows=EXPORT_CHUNK_ROWS):
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="", write_through=True)
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        chunk.to_csv(text, index=False, header=(i == 0))
+    if len(df) == 0: df.to_csv(text, index=False)
+    text.detach()
+
+def write_parquet(df, f, chunk_rows=EXPORT_CHUNK_ROWS):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(f, schema) as w:
+        for chunk in _chunks(df, chunk_rows):
+            w.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def write_xlsx(df, f, chunk_rows=EXPORT_CHUNK_ROWS):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append([str(c) for c in df.columns])
+    for chunk in _chunks(df.iloc[:XLSX_MAX_ROWS], chunk_rows):
+        cols = [chunk[c].astype(object).where(chunk[c].notna(), None).to_numpy() for c in chunk.columns]
+        for row in zip(*cols): ws.append(row)
+    wb.save(f)
+
+WRITERS = {"CSV": write_csv, "Parquet": write_parquet, "XLSX": write_xlsx}
+
+def export_file(df, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    # bytes: st.download_button's deferred callable accepts bytes/str/BytesIO, not a temp file object
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as f:
+        WRITERS[fmt](df, f, chunk_rows)
+        f.seek(0)
+        return f.read()
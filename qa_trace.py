@@ -0,0 +1,101 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ===================================================================
+# OPT-IN TIMING SPANS
+# ===================================================================
+# A Tracer collects nested spans (name, ms, rows, payload bytes, ...) for one
+# script run. It is activated per run through a ContextVar, so library code
+# (qa_ingest, renderers) can open spans without threading an argument through;
+# with no active tracer span() is a no-op. Finished runs are appended to a
+# JSON-lines log for aggregation across sessions.
+#
+# Enable per session from the sidebar, or for every session with QA_TRACE=1.
+
+TRACE_ENV = os.environ.get("QA_TRACE", "") not in ("", "0", "false")
+TRACE_LOG = os.environ.get("QA_TRACE_LOG", os.path.join(os.path.expanduser("~"), ".local", "share", "qa_system", "trace.jsonl"))
+
+_active = contextvars.ContextVar("qa_tracer", default=None)
+_log_lock = threading.Lock()
+
+class Tracer:
+    def __init__(self, session=None, log_path=TRACE_LOG):
+        self.session = session or uuid.uuid4().hex[:12]
+        self.run = uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.spans = []
+        self.closed = False
+        self._stack = []
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        rec = {"span": name, "parent": self._stack[-1]["span"] if self._stack else None, "depth": len(self._stack), **attrs}
+        self._stack.append(rec)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        except Exception as e:
+            rec["error"] = type(e).__name__; raise
+        finally:
+            rec["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            rec["start_ms"] = round((t0 - self._t0) * 1000, 3)
+            self._stack.pop()
+            self.spans.append(rec)
+
+    def note(self, **attrs):
+        if self._stack: self._stack[-1].update(attrs)
+
+    def records(self):
+        return sorted(self.spans, key=lambda r: r["start_ms"])
+
+    def flush(self):
+        self.closed = True
+        if not self.spans or not self.log_path: return
+        ts = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        lines = "".join(json.dumps({"ts": ts, "session": self.session, "run": self.run, **r}, default=str) + "\n" for r in self.records())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with _log_lock, open(self.log_path, "a", encoding="utf-8") as f: f.write(lines)
+        except OSError:
+            pass                                  # diagnostics must never break the dashboard
+
+class _NullSpan:
+    def __enter__(self): return {}
+    def __exit__(self, *exc): return False
+
+_NULL = _NullSpan()
+
+def activate(tracer):
+    _active.set(tracer)
+    return tracer
+
+def active():
+    return _active.get()
+
+def span(name, **attrs):
+    t = _active.get()
+    return _NULL if t is None else t.span(name, **attrs)
+
+def note(**attrs):
+    t = _active.get()
+    if t is not None: t.note(**attrs)
+
+def traced(name):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active.get() is None: return fn(*args, **kwargs)
+            with span(name): return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def new_session_id():
+    return uuid.uuid4().hex[:12]